@@ -19,35 +19,30 @@
 
 from gi.repository import Adw
 from gi.repository import Gtk
+from gi.repository import GLib
 from gi.repository import GObject
 
+from gettext import gettext as _
 
-class Change():
-    def __init__(self, _name):
-        self.changes = []
-        self.name = _name
-
-    def add_change(self, x, y, prev_char):
-        for change in self.changes:
-            if change[0] == x and change[1] == y:
-                return
-        self.changes.append((x, y, prev_char))
-
-    def __repr__(self):
-        return f"The change named {self.name} has {len(self.changes)} changes"
+from .grid import Grid, Overlay
+from .history import Change, History, DEFAULT_MEMORY_LIMIT
+from .regions import RegionIndex
+from .renderer import CanvasLayer, GlyphAtlas
 
 
 @Gtk.Template(resource_path='/io/github/nokse22/asciidraw/ui/canvas.ui')
 class Canvas(Adw.Bin):
     __gtype_name__ = 'Canvas'
-    draw_drawing_area = Gtk.Template.Child()
-    preview_drawing_area = Gtk.Template.Child()
+    scrolled_window = Gtk.Template.Child()
+    drawing_layer = Gtk.Template.Child()
+    preview_layer = Gtk.Template.Child()
     fixed = Gtk.Template.Child()
 
     __gsignals__ = {
         'undo-added': (GObject.SignalFlags.RUN_FIRST, None, (str,)),
         'undo-removed': (GObject.SignalFlags.RUN_FIRST, None, ()),
-        'redo-removed': (GObject.SignalFlags.RUN_FIRST, None, ())
+        'redo-removed': (GObject.SignalFlags.RUN_FIRST, None, ()),
+        'history-jumped': (GObject.SignalFlags.RUN_FIRST, None, ())
     }
 
     def __init__(self, _styles, _flip):
@@ -58,66 +53,115 @@ class Canvas(Adw.Bin):
         self.primary_char = '#'
         self.secondary_char = '+'
 
-        self.drawing: list[list[str]] = []
-        self.preview: list[list[str]] = []
+        self.drawing: Grid = None
+        self.preview: Overlay = None
 
         self.primary_selected = True
 
         self._style = 1
 
+        # Input is connected once here and handed to the active tool
+        self.active_tool = None
+
+        # Drag updates are applied once per frame, before layout
+        self.drag_samples = []
+        self.drag_tick_id = None
+
         self.drag_gesture = Gtk.GestureDrag()
         self.drag_gesture.set_propagation_phase(Gtk.PropagationPhase.CAPTURE)
         self.drag_gesture.set_button(0)
+        self.drag_gesture.connect("drag-begin", self.on_drag_begin)
+        self.drag_gesture.connect("drag-update", self.on_drag_update)
+        self.drag_gesture.connect("drag-end", self.on_drag_end)
         self.fixed.add_controller(self.drag_gesture)
 
         self.click_gesture = Gtk.GestureClick()
         self.click_gesture.set_propagation_phase(Gtk.PropagationPhase.CAPTURE)
         self.click_gesture.set_button(0)
+        self.click_gesture.connect("pressed", self.on_click_pressed)
+        self.click_gesture.connect("released", self.on_click_released)
+        self.click_gesture.connect("stopped", self.on_click_stopped)
         self.fixed.add_controller(self.click_gesture)
 
+        self.motion_controller = Gtk.EventControllerMotion()
+        self.motion_controller.connect("motion", self.on_motion)
+        self.motion_controller.connect("leave", self.on_leave)
+        self.fixed.add_controller(self.motion_controller)
+
         self.zoom_gesture = Gtk.GestureZoom()
         self.zoom_gesture.set_propagation_phase(Gtk.PropagationPhase.CAPTURE)
         self.zoom_gesture.connect("scale-changed", self.on_scale_changed)
         self.fixed.add_controller(self.zoom_gesture)
 
-        self.draw_drawing_area.set_draw_func(self.drawing_function, None)
-        self.preview_drawing_area.set_draw_func(
-            self.preview_drawing_function, None)
-
         self.x_mul = 12
         self.y_mul = 24
 
         self.canvas_width = 40
         self.canvas_height = 20
 
-        self.draw_drawing_area.set_size_request(
+        self.drawing_layer.set_size_request(
             self.canvas_width*self.x_mul, self.canvas_height*self.y_mul)
 
-        for y in range(self.canvas_height):
-            new_line = []
-            for x in range(self.canvas_width):
-                new_line.append(" ")
-            self.drawing.append(new_line)
-            self.preview.append(new_line)
+        self.drawing = Grid(self.canvas_width, self.canvas_height)
+        self.preview = Overlay(self.canvas_width, self.canvas_height)
 
-        self.x_mul = 12
-        self.y_mul = 24
+        self.drawing_layer.set_grid(self.drawing)
+        self.preview_layer.set_grid(self.preview)
 
-        self.undo_changes = []
-        self.changed_chars = []
+        self.scale_factor = 1
 
-        self.redo_changes = []
+        self.glyph_atlas = None
+        self.update_glyph_atlas()
+        self.connect("notify::scale-factor", self.update_glyph_atlas)
+
+        self.bind_property(
+            'color', self.drawing_layer, 'color',
+            GObject.BindingFlags.SYNC_CREATE)
+        self.bind_property(
+            'color', self.preview_layer, 'color',
+            GObject.BindingFlags.SYNC_CREATE)
+
+        # GTK reuses the last render of the layers when scrolling, since
+        # only the visible rows are drawn they need a new snapshot
+        self.scrolled_window.get_hadjustment().connect(
+            "value-changed", self.on_scrolled)
+        self.scrolled_window.get_vadjustment().connect(
+            "value-changed", self.on_scrolled)
+
+        self.history = History(DEFAULT_MEMORY_LIMIT)
+        self.history.set_grid(self.drawing)
+
+        self.region_index = RegionIndex()
+        self.region_index.set_grid(self.drawing)
+        self.changed_chars = []
 
         self.canvas_max_x = 100
         self.canvas_max_y = 50
 
-        self.scale_factor = 1
-
         self.is_saved = True
 
     def get_canvas_size(self):
         return self.canvas_width, self.canvas_height
 
+    @GObject.Property(type=float, default=0)
+    def color(self):
+        return self._color
+
+    @color.setter
+    def color(self, value):
+        self._color = value
+        self.notify('color')
+
+    @GObject.Property(type=int, default=DEFAULT_MEMORY_LIMIT)
+    def history_memory_limit(self):
+        return self.history.memory_limit
+
+    @history_memory_limit.setter
+    def history_memory_limit(self, value):
+        self.history.memory_limit = value
+        self.history.enforce_memory_limit()
+        self.notify('history_memory_limit')
+
     @GObject.Property(type=bool, default=True)
     def primary_selected(self):
         return self._primary_selected
@@ -154,89 +198,130 @@ class Canvas(Adw.Bin):
         self._style = value
         self.notify('style')
 
+    def set_active_tool(self, tool):
+        previous = self.active_tool
+        self.flush_drag_samples()
+        self.active_tool = tool
+        if previous is not None and previous is not tool:
+            previous.active = False
+
+    def on_drag_begin(self, gesture, x, y):
+        if self.active_tool is not None:
+            self.active_tool.on_drag_begin(gesture, x, y)
+
+    def on_drag_update(self, gesture, x, y):
+        if self.active_tool is None:
+            return
+        self.drag_samples.append((x, y))
+        if self.drag_tick_id is None:
+            self.drag_tick_id = self.fixed.add_tick_callback(
+                self.on_drag_tick)
+
+    def on_drag_tick(self, widget, frame_clock):
+        self.drag_tick_id = None
+        self.flush_drag_samples()
+        return GLib.SOURCE_REMOVE
+
+    def flush_drag_samples(self):
+        if self.drag_tick_id is not None:
+            self.fixed.remove_tick_callback(self.drag_tick_id)
+            self.drag_tick_id = None
+        samples = self.drag_samples
+        self.drag_samples = []
+        if samples and self.active_tool is not None:
+            self.active_tool.on_drag_samples(self.drag_gesture, samples)
+
+    def on_drag_end(self, gesture, x, y):
+        # The samples of the last frame are drawn before the drag ends
+        self.flush_drag_samples()
+        if self.active_tool is not None:
+            self.active_tool.on_drag_end(gesture, x, y)
+
+    def on_click_pressed(self, click, arg, x, y):
+        if self.active_tool is not None:
+            self.active_tool.on_click_pressed(click, arg, x, y)
+
+    def on_click_released(self, click, arg, x, y):
+        if self.active_tool is not None:
+            self.active_tool.on_click_released(click, arg, x, y)
+
+    def on_click_stopped(self, click):
+        if self.active_tool is not None:
+            self.active_tool.on_click_stopped(click)
+
+    def on_motion(self, controller, x, y):
+        if self.active_tool is not None:
+            self.active_tool.on_motion(controller, x, y)
+
+    def on_leave(self, controller):
+        if self.active_tool is not None:
+            self.active_tool.on_leave(controller)
+
     def on_scale_changed(self, gesture, scale):
         # print(scale)
         pass
         # if scale > 2:
         #     self.scale_factor = 2
 
-    def drawing_function(self, area, cr, width, height, data):
-        cr.set_source_rgb(self.color, self.color, self.color)
-        cr.select_font_face("Adwaita Mono")
-        cr.set_font_size(20 * self.scale_factor)
-
-        for y, line in enumerate(self.drawing):
-            for x, char in enumerate(line):
-                cr.move_to(
-                    x * self.x_mul,
-                    (y + 1) * self.y_mul * self.scale_factor - 5)
-                cr.show_text(char)
-
-    def preview_drawing_function(self, area, cr, width, height, data):
-        cr.set_source_rgb(self.color, self.color, self.color)
-        cr.select_font_face("Adwaita Mono")
-        cr.set_font_size(20 * self.scale_factor)
-
-        for y, line in enumerate(self.preview):
-            for x, char in enumerate(line):
-                cr.move_to(
-                    x * self.x_mul,
-                    (y + 1) * self.y_mul * self.scale_factor - 5)
-                cr.show_text(char)
+    def update_glyph_atlas(self, *args):
+        # Glyphs are rasterized at the scale of the display the canvas is
+        # on, so the atlas is made again when it moves to another one
+        scale = self.get_scale_factor()
+        if self.glyph_atlas is not None and self.glyph_atlas.scale == scale:
+            return
+        self.glyph_atlas = GlyphAtlas(
+            "Adwaita Mono", 20 * self.scale_factor, self.x_mul, self.y_mul,
+            scale)
+        self.drawing_layer.set_atlas(self.glyph_atlas)
+        self.preview_layer.set_atlas(self.glyph_atlas)
+
+    def on_scrolled(self, adjustment):
+        self.drawing_layer.queue_draw()
+        self.preview_layer.queue_draw()
 
     def update(self):
-        self.draw_drawing_area.queue_draw()
+        self.drawing_layer.queue_draw()
 
     def update_preview(self):
-        self.preview_drawing_area.queue_draw()
+        self.preview_layer.queue_draw()
 
     def undo(self):
-        try:
-            change_object = self.undo_changes[-1]
-        except Exception:
+        if not self.history.undo():
             return
-        redo_object = Change(change_object.name)
-        for x, y, char in change_object.changes:
-            if (y >= len(self.drawing) or x >= len(self.drawing[0])
-                    or x < 0 or y < 0):
-                return
-            redo_object.add_change(x, y, self.get_char_at(x, y))
-            self.drawing[int(y)][int(x)] = char
-
-        self.redo_changes.append(redo_object)
-        self.undo_changes.pop(-1)
+        self.follow_grid_size()
         self.emit("undo-removed")
         self.update()
 
     def redo(self):
-        try:
-            change_object = self.redo_changes[-1]
-        except Exception:
+        if not self.history.redo():
             return
-        self.add_undo_action(change_object.name)
-        for x, y, char in change_object.changes:
-            if (y >= len(self.drawing) or x >= len(self.drawing[0])
-                    or x < 0 or y < 0):
-                return
-            self.undo_changes[-1].add_change(x, y, self.get_char_at(x, y))
-            self.drawing[int(y)][int(x)] = char
-        self.redo_changes.pop(-1)
+        self.follow_grid_size()
         self.emit("redo-removed")
         self.update()
 
+    def jump_to(self, index):
+        self.history.jump(index)
+        self.follow_grid_size()
+        self.emit("history-jumped")
+        self.update()
+
+    def follow_grid_size(self):
+        # Undoing a resize changes the size of the grid, the preview is
+        # only resized, and so cleared, when that happened
+        size = self.drawing.get_size()
+        if size != (self.canvas_width, self.canvas_height):
+            self.change_canvas_size(*size)
+
     def add_undo_action(self, undo_name):
-        self.undo_changes.append(Change(undo_name))
+        self.history.push(Change(undo_name))
         self.emit('undo-added', undo_name)
 
         self.is_saved = False
 
     def get_char_at(self, x: int, y: int, draw=True):
-        if (y >= len(self.drawing) or x >= len(self.drawing[0])
-                or x < 0 or y < 0):
-            return
         if draw:
-            return self.drawing[int(y)][int(x)]
-        return self.preview[int(y)][int(x)]
+            return self.drawing.get(x, y)
+        return self.preview.get(x, y)
 
     def set_selected_char(self, char):
         if self._primary_selected:
@@ -263,27 +348,16 @@ class Canvas(Adw.Bin):
 
     def __draw_text(self, start_x, start_y, text, transparent, draw, _layer):
         lines = text.splitlines()
-        max_line_length = max(len(line) for line in lines)
-        array2 = [list(line.ljust(max_line_length)) for line in lines]
-
-        rows1, cols1 = len(_layer), len(_layer[0])
-        rows2, cols2 = len(array2), len(array2[0])
-
-        if start_x >= cols1 or start_y >= rows1:
+        if not lines:
             return
+        max_line_length = max(len(line) for line in lines)
+        lines = [line.ljust(max_line_length) for line in lines]
 
-        for i in range(rows2):
-            for j in range(cols2):
-                new_i, new_j = i + start_y, j + start_x
+        if draw:
+            self.history.add_rect(
+                start_x, start_y, max_line_length, len(lines))
 
-                if 0 <= new_i < rows1 and 0 <= new_j < cols1:
-                    if transparent and array2[i][j] == " ":
-                        continue
-                    if draw:
-                        prev_char = self.get_char_at(new_j, new_i)
-                        self.undo_changes[-1].add_change(
-                            new_j, new_i, prev_char)
-                    _layer[int(new_i)][int(new_j)] = array2[i][j]
+        _layer.blit(int(start_x), int(start_y), lines, transparent)
 
     def draw_rectangle(self, start_x_char, start_y_char, width, height, draw):
         if width <= 1 or height <= 1:
@@ -349,114 +423,126 @@ class Canvas(Adw.Bin):
         if char == "":
             char = " "
 
-        if y >= len(_layer) or x >= len(_layer[0]) or x < 0 or y < 0:
+        if not _layer.in_bounds(x, y):
             return
         if draw:
             prev_char = self.get_char_at(x, y)
-            self.undo_changes[-1].add_change(x, y, prev_char)
-        _layer[int(y)][int(x)] = char
+            self.history.add_change(x, y, prev_char)
+        _layer.set(x, y, char)
 
     def draw_at(self, x, y):
-        if (y >= len(self.drawing) or x >= len(self.drawing[0])
-                or x < 0 or y < 0):
+        if not self.drawing.in_bounds(x, y):
             return
         prev_char = self.get_char_at(x, y)
-        self.undo_changes[-1].add_change(x, y, prev_char)
-        self.drawing[int(y)][int(x)] = self.get_selected_char()
+        self.history.add_change(x, y, prev_char)
+        self.drawing.set(x, y, self.get_selected_char())
 
     def draw_inverted_at(self, x, y):
-        if (y >= len(self.drawing) or x >= len(self.drawing[0])
-                or x < 0 or y < 0):
+        if not self.drawing.in_bounds(x, y):
             return
         prev_char = self.get_char_at(x, y)
-        self.undo_changes[-1].add_change(x, y, prev_char)
-        self.drawing[int(y)][int(x)] = self.get_unselected_char()
+        self.history.add_change(x, y, prev_char)
+        self.drawing.set(x, y, self.get_unselected_char())
 
     def draw_primary_at(self, x, y, draw):
         _layer = self.drawing if draw else self.preview
 
-        if y >= len(_layer) or x >= len(_layer[0]) or x < 0 or y < 0:
+        if not _layer.in_bounds(x, y):
             return
         if draw:
             prev_char = self.get_char_at(x, y)
-            self.undo_changes[-1].add_change(x, y, prev_char)
-        _layer[int(y)][int(x)] = self.primary_char
+            self.history.add_change(x, y, prev_char)
+        _layer.set(x, y, self.primary_char)
 
     def draw_secondary_at(self, x, y, draw):
         _layer = self.drawing if draw else self.preview
 
-        if y >= len(_layer) or x >= len(_layer[0]) or x < 0 or y < 0:
+        if not _layer.in_bounds(x, y):
             return
         if draw:
             prev_char = self.get_char_at(x, y)
-            self.undo_changes[-1].add_change(x, y, prev_char)
-        _layer[int(y)][int(x)] = self.secondary_char
+            self.history.add_change(x, y, prev_char)
+        _layer.set(x, y, self.secondary_char)
 
     def clear_preview(self):
-        self.preview = []
-        for y in range(self.canvas_height):
-            new_line = []
-            for x in range(self.canvas_width):
-                new_line.append(" ")
-            self.preview.append(new_line)
+        self.preview.clear()
 
-        self.preview_drawing_area.queue_draw()
+        self.preview_layer.queue_draw()
 
     def clear_canvas(self):
-        for y in range(self.canvas_height):
-            for x in range(self.canvas_width):
-                self.set_char_at(x, y, "", True)
+        self.clear_rect(0, 0, self.canvas_width, self.canvas_height, True)
 
-        self.draw_drawing_area.queue_draw()
+        self.drawing_layer.queue_draw()
 
-    def wipe_canvas(self):
-        for y in range(self.canvas_height):
-            for x in range(self.canvas_width):
-                if (y >= len(self.drawing) or x >= len(self.drawing[0])
-                        or x < 0 or y < 0):
-                    return
-                self.drawing[int(y)][int(x)] = ""
+    def fill_rect(self, x, y, width, height, char, draw):
+        _layer = self.drawing if draw else self.preview
 
-        self.draw_drawing_area.queue_draw()
+        if draw:
+            self.history.add_rect(x, y, width, height)
+        _layer.fill(x, y, width, height, char)
 
-    def change_canvas_size(self, final_x, final_y):
-        content = self.get_content()
+    def clear_rect(self, x, y, width, height, draw):
+        self.fill_rect(x, y, width, height, " ", draw)
 
-        self.drawing = []
-        self.preview = []
+    def blit(self, x, y, block, transparent, draw):
+        if not block:
+            return
+        _layer = self.drawing if draw else self.preview
 
+        if draw:
+            self.history.add_rect(
+                x, y, max(len(line) for line in block), len(block))
+
+        _layer.blit(int(x), int(y), block, transparent)
+
+    def fill_runs(self, runs, char):
+        # The runs have to hold the same char, as found by find_region
+        self.history.add_runs(runs, char)
+        self.drawing.fill_runs(runs, char)
+
+    def copy_rect(self, x, y, width, height):
+        region = self.drawing.get_region(x, y, width, height)
+        if region is None:
+            return []
+        rect, rows = region
+        return [''.join(map(chr, row)).replace('\0', ' ') for row in rows]
+
+    def wipe_canvas(self):
+        self.drawing.clear(" ")
+
+        self.drawing_layer.queue_draw()
+
+    def change_canvas_size(self, final_x, final_y, anchor=(0, 0)):
         self.canvas_width = final_x
         self.canvas_height = final_y
 
-        for y in range(self.canvas_height):
-            new_line = []
-            for x in range(self.canvas_width):
-                new_line.append(" ")
-            self.drawing.append(new_line)
-            self.preview.append(new_line)
+        self.drawing.resize(
+            self.canvas_width, self.canvas_height, anchor=anchor)
+        self.preview.resize(self.canvas_width, self.canvas_height)
 
-        self.draw_drawing_area.set_size_request(
+        self.drawing_layer.set_size_request(
             self.canvas_width*self.x_mul, self.canvas_height*self.y_mul)
 
-        self.__draw_text(0, 0, content, False, False, self.drawing)
+    def resize_canvas(self, width, height, anchor=(0, 0)):
+        if (width, height) == self.drawing.get_size():
+            return
+        self.add_undo_action(_("Resize"))
+        self.history.add_resize(width, height, anchor)
+        self.change_canvas_size(width, height, anchor)
+        self.update()
 
     def get_content(self):
-        content = ""
-
-        for index, line in enumerate(self.drawing):
-            line_string = ''.join(w if w != "" else " " for w in line)
-            content += line_string + "\n"
-
-        return content
-
-    def set_content(self, content):
-        self.wipe_canvas()
-        lines = content.split('\n')
-        num_lines = len(lines)
-        max_chars = max(len(line) for line in lines)
-        self.change_canvas_size(max(max_chars, 10), max(num_lines - 1, 5))
-        self.clear_preview()
-        self.__draw_text(0, 0, content, False, False, self.drawing)
+        return self.drawing.to_string()
+
+    def load_grid(self, grid):
+        self.drawing = grid
+        self.drawing_layer.set_grid(grid)
+
+        self.history.clear()
+        self.history.set_grid(grid)
+        self.region_index.set_grid(grid)
+
+        self.change_canvas_size(*grid.get_size())
         self.update()
 
     def top_horizontal(self):
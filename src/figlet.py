@@ -0,0 +1,130 @@
+# figlet.py
+#
+# Copyright 2023-2025 Nokse
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from gi.repository import GLib
+
+import os
+
+from collections import OrderedDict
+
+PREVIEW_TEXT = "font 123"
+
+# Parsed fonts and rendered texts kept, the least recently used go first
+FONT_CACHE_SIZE = 8
+RENDER_CACHE_SIZE = 256
+
+
+def get_pyfiglet():
+    # pyfiglet is slow to import, it is only loaded when a font is first
+    # needed
+    import pyfiglet
+    return pyfiglet
+
+
+class FigletRenderer():
+    # Renders text with a figlet font, "Normal" leaves it as it is. Fonts
+    # are parsed once and the results are kept, so previews that only move
+    # the text or go back to a font used before do not render again.
+
+    def __init__(self):
+        self.fonts = OrderedDict()
+        self.renders = OrderedDict()
+
+    def __repr__(self):
+        return f"Figlet renderer with {len(self.fonts)} fonts " \
+            f"and {len(self.renders)} texts"
+
+    def get_font(self, font):
+        figlet = self.fonts.get(font)
+        if figlet is not None:
+            self.fonts.move_to_end(font)
+            return figlet
+
+        figlet = get_pyfiglet().Figlet(font=font)
+        self.fonts[font] = figlet
+        if len(self.fonts) > FONT_CACHE_SIZE:
+            self.fonts.popitem(last=False)
+        return figlet
+
+    def render(self, text, font, vertical=False):
+        key = (text, font, vertical)
+        rendered = self.renders.get(key)
+        if rendered is not None:
+            self.renders.move_to_end(key)
+            return rendered
+
+        rendered = "\n".join(text) if vertical else text
+        if font != "Normal":
+            rendered = self.get_font(font).renderText(rendered)
+
+        self.renders[key] = rendered
+        if len(self.renders) > RENDER_CACHE_SIZE:
+            self.renders.popitem(last=False)
+        return rendered
+
+
+class PreviewQueue():
+    # Renders the previews of the fonts from an idle callback, one font at
+    # a time, so the font chooser can be shown before they are all done.
+    # Previews are kept on disk, in a folder for each pyfiglet version.
+
+    def __init__(self, fonts, callback):
+        self.fonts = list(fonts)
+        self.callback = callback
+        self.source = None
+        self.cache_dir = None
+
+    def start(self):
+        if self.source is None and self.fonts:
+            self.source = GLib.idle_add(
+                self.on_idle, priority=GLib.PRIORITY_LOW)
+
+    def on_idle(self):
+        font = self.fonts.pop(0)
+        self.callback(font, self.get_preview(font))
+        if self.fonts:
+            return GLib.SOURCE_CONTINUE
+        self.source = None
+        return GLib.SOURCE_REMOVE
+
+    def get_preview(self, font):
+        pyfiglet = get_pyfiglet()
+        if self.cache_dir is None:
+            self.cache_dir = os.path.join(
+                GLib.get_user_cache_dir(), 'ascii-draw', 'font-previews',
+                pyfiglet.__version__)
+
+        path = os.path.join(self.cache_dir, font + ".txt")
+        try:
+            with open(path, 'r') as file:
+                return file.read()
+        except OSError:
+            pass
+
+        text = pyfiglet.figlet_format(PREVIEW_TEXT, font=font)
+
+        temp_path = path + ".tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_path, 'w') as file:
+                file.write(text)
+            os.replace(temp_path, path)
+        except OSError as error:
+            print(f"Error caching the font preview: {error}")
+        return text
@@ -0,0 +1,185 @@
+# files.py
+#
+# Copyright 2023-2025 Nokse
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from gi.repository import Gio
+from gi.repository import GLib
+from gi.repository import GObject
+
+import codecs
+
+from .grid import Grid
+
+CHUNK_SIZE = 256 * 1024
+
+
+class FileLoader(GObject.GObject):
+    # Reads a file a chunk at a time from the main loop and writes its
+    # lines into a new grid, that is only handed over once the whole file
+    # is read, so cancelling leaves the canvas untouched
+
+    __gsignals__ = {
+        'progress': (GObject.SignalFlags.RUN_FIRST, None, (float,)),
+        'loaded': (GObject.SignalFlags.RUN_FIRST, None, (object,)),
+        'failed': (GObject.SignalFlags.RUN_FIRST, None, (str,)),
+        'cancelled': (GObject.SignalFlags.RUN_FIRST, None, ()),
+    }
+
+    def __init__(self, file):
+        super().__init__()
+
+        self.file = file
+        self.cancellable = Gio.Cancellable()
+
+        self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self.partial_line = ""
+
+        self.grid = Grid(10, 5)
+        self.rows = 0
+
+        self.size = 0
+        self.read_size = 0
+
+    def load(self):
+        self.file.query_info_async(
+            Gio.FILE_ATTRIBUTE_STANDARD_SIZE, Gio.FileQueryInfoFlags.NONE,
+            GLib.PRIORITY_DEFAULT, self.cancellable, self.on_info)
+
+    def cancel(self):
+        self.cancellable.cancel()
+
+    def on_info(self, file, result):
+        try:
+            info = file.query_info_finish(result)
+        except GLib.Error as error:
+            self.fail(error)
+            return
+        self.size = info.get_size()
+
+        self.file.read_async(
+            GLib.PRIORITY_DEFAULT, self.cancellable, self.on_opened)
+
+    def on_opened(self, file, result):
+        try:
+            stream = file.read_finish(result)
+        except GLib.Error as error:
+            self.fail(error)
+            return
+        self.read_next(stream)
+
+    def read_next(self, stream):
+        stream.read_bytes_async(
+            CHUNK_SIZE, GLib.PRIORITY_DEFAULT, self.cancellable,
+            self.on_read)
+
+    def on_read(self, stream, result):
+        try:
+            data = stream.read_bytes_finish(result).get_data()
+        except GLib.Error as error:
+            stream.close_async(GLib.PRIORITY_DEFAULT, None, None)
+            self.fail(error)
+            return
+
+        if not data:
+            stream.close_async(GLib.PRIORITY_DEFAULT, None, None)
+            self.add_text(self.decoder.decode(b'', True))
+            if self.partial_line:
+                self.add_lines([self.partial_line])
+            self.emit('loaded', self.grid)
+            return
+
+        self.read_size += len(data)
+        self.add_text(self.decoder.decode(data))
+        if self.size:
+            self.emit('progress', min(self.read_size / self.size, 1))
+
+        self.read_next(stream)
+
+    def fail(self, error):
+        if error.matches(Gio.io_error_quark(), Gio.IOErrorEnum.CANCELLED):
+            self.emit('cancelled')
+        else:
+            self.emit('failed', error.message)
+
+    def add_text(self, text):
+        lines = (self.partial_line + text).split('\n')
+        self.partial_line = lines.pop()
+        self.add_lines(lines)
+
+    def add_lines(self, lines):
+        if not lines:
+            return
+        lines = [line.rstrip('\r') for line in lines]
+
+        width = max(self.grid.width, max(len(line) for line in lines))
+        height = max(self.grid.height, self.rows + len(lines))
+        self.grid.resize(width, height)
+
+        self.grid.blit(0, self.rows, lines)
+        self.rows += len(lines)
+
+
+class FileSaver(GObject.GObject):
+    # Writes go through replace_contents, that writes a temporary file and
+    # moves it over the old one. Saves asked for while one is running are
+    # merged into a single one, done after it with the latest content.
+
+    __gsignals__ = {
+        'saved': (GObject.SignalFlags.RUN_FIRST, None, (object,)),
+        'failed': (GObject.SignalFlags.RUN_FIRST, None, (object, str)),
+    }
+
+    def __init__(self):
+        super().__init__()
+
+        self.saving = False
+        self.pending = None
+
+    def save(self, file, get_contents, callback=None):
+        # get_contents is only called when the write starts
+        callbacks = [callback] if callback else []
+        if self.saving:
+            if self.pending is not None:
+                callbacks = self.pending[2] + callbacks
+            self.pending = (file, get_contents, callbacks)
+            return
+
+        self.start(file, get_contents, callbacks)
+
+    def start(self, file, get_contents, callbacks):
+        self.saving = True
+        contents = GLib.Bytes.new(get_contents().encode())
+        file.replace_contents_bytes_async(
+            contents, None, False, Gio.FileCreateFlags.NONE, None,
+            self.on_replaced, callbacks)
+
+    def on_replaced(self, file, result, callbacks):
+        self.saving = False
+        try:
+            file.replace_contents_finish(result)
+        except GLib.Error as error:
+            self.emit('failed', file, error.message)
+        else:
+            self.emit('saved', file)
+            for callback in callbacks:
+                callback()
+
+        if self.pending is not None:
+            pending = self.pending
+            self.pending = None
+            self.start(*pending)
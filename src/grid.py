@@ -0,0 +1,420 @@
+# grid.py
+#
+# Copyright 2023-2025 Nokse
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from array import array
+
+MAX_DAMAGE_RECTS = 256
+
+
+def to_code(char):
+    if char is None or char == "":
+        return 0
+    return ord(char[0])
+
+
+def to_char(code):
+    return chr(code) if code else ""
+
+
+class DamageTracker():
+    # Records the rectangles of cells that changed since the renderer last
+    # took them
+
+    def add_damage(self, x, y, width, height):
+        self.damage.append((x, y, width, height))
+        if len(self.damage) > MAX_DAMAGE_RECTS:
+            self.damage = [self.get_damage_bounds()]
+
+    def get_damage_bounds(self):
+        if not self.damage:
+            return None
+        x0 = min(rect[0] for rect in self.damage)
+        y0 = min(rect[1] for rect in self.damage)
+        x1 = max(rect[0] + rect[2] for rect in self.damage)
+        y1 = max(rect[1] + rect[3] for rect in self.damage)
+        return x0, y0, x1 - x0, y1 - y0
+
+    def take_damage(self):
+        damage = self.damage
+        self.damage = []
+        return damage
+
+    def clip(self, x, y, width, height):
+        x, y, width, height = int(x), int(y), int(width), int(height)
+        x0, y0 = max(x, 0), max(y, 0)
+        x1 = min(x + width, self.width)
+        y1 = min(y + height, self.height)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return x0, y0, x1 - x0, y1 - y0
+
+
+class Grid(DamageTracker):
+    # Cells are stored row by row as code points, a cell is at
+    # y * width + x. Code point 0 is a cell set to an empty char, it reads
+    # back as "" and is exported as a space.
+
+    def __init__(self, width, height, char=" "):
+        self.width = int(width)
+        self.height = int(height)
+        self.cells = array('I', [to_code(char)]) * (self.width * self.height)
+
+        self.damage_listeners = []
+        self.damage_all()
+
+    def __repr__(self):
+        return f"Grid {self.width}x{self.height}"
+
+    def add_damage(self, x, y, width, height):
+        super().add_damage(x, y, width, height)
+        for row in range(y, y + height):
+            self.row_strings.pop(row, None)
+        for listener in self.damage_listeners:
+            listener((x, y, width, height))
+
+    def damage_all(self):
+        self.damage = [(0, 0, self.width, self.height)]
+        # Exported rows, built when first asked for and dropped when one
+        # of their cells changes
+        self.row_strings = {}
+        for listener in self.damage_listeners:
+            listener(None)
+
+    def add_damage_listener(self, listener):
+        # Called with every damaged rect, or None when the whole grid
+        # changed
+        self.damage_listeners.append(listener)
+
+    def remove_damage_listener(self, listener):
+        self.damage_listeners.remove(listener)
+
+    def get_size(self):
+        return self.width, self.height
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def get(self, x, y):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        return to_char(self.cells[int(y) * self.width + int(x)])
+
+    def set(self, x, y, char):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        x, y = int(x), int(y)
+        self.cells[y * self.width + x] = to_code(char)
+        self.add_damage(x, y, 1, 1)
+        return True
+
+    def get_row_codes(self, y):
+        start = int(y) * self.width
+        return self.cells[start:start + self.width]
+
+    def get_row_text(self, y, start=0, end=None):
+        row = int(y) * self.width
+        end = self.width if end is None else min(end, self.width)
+        return ''.join(map(chr, self.cells[row + start:row + end]))
+
+    def get_row(self, y):
+        row = self.row_strings.get(y)
+        if row is None:
+            row = ''.join(map(chr, self.get_row_codes(y))).replace('\0', ' ')
+            self.row_strings[y] = row
+        return row
+
+    def get_rows(self):
+        return [self.get_row(y) for y in range(self.height)]
+
+    def get_region(self, x, y, width, height):
+        rect = self.clip(x, y, width, height)
+        if rect is None:
+            return None
+        x, y, width, height = rect
+        rows = []
+        for row in range(y, y + height):
+            start = row * self.width + x
+            rows.append(self.cells[start:start + width])
+        return rect, rows
+
+    def get_block(self, x, y, width, height):
+        # The rect has to be inside the grid, the cells are returned row
+        # after row
+        block = array('I')
+        for row in range(y, y + height):
+            start = row * self.width + x
+            block.extend(self.cells[start:start + width])
+        return block
+
+    def find_region(self, x, y, visited=None):
+        # Scanline search of the cells connected to (x, y) holding its same
+        # char, returned as x, y, length triples of horizontal runs. The
+        # cells found are marked in visited, one byte per cell, and cells
+        # already marked in it are skipped.
+        runs = array('i')
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return runs
+        x, y = int(x), int(y)
+
+        cells = self.cells
+        width = self.width
+        target = cells[y * width + x]
+        if visited is None:
+            visited = bytearray(width * self.height)
+
+        stack = [(x, y)]
+        while stack:
+            x, y = stack.pop()
+            start = y * width
+            if visited[start + x]:
+                continue
+
+            left = x
+            while left > 0 and cells[start + left - 1] == target:
+                left -= 1
+            right = x
+            while right < width - 1 and cells[start + right + 1] == target:
+                right += 1
+
+            visited[start + left:start + right + 1] = \
+                b'\x01' * (right - left + 1)
+            runs.extend((left, y, right - left + 1))
+
+            # One seed for every run touching this one in the rows around
+            for row in (y - 1, y + 1):
+                if not 0 <= row < self.height:
+                    continue
+                row_start = row * width
+                in_run = False
+                for column in range(left, right + 1):
+                    index = row_start + column
+                    if cells[index] == target and not visited[index]:
+                        if not in_run:
+                            stack.append((column, row))
+                            in_run = True
+                    else:
+                        in_run = False
+
+        return runs
+
+    def set_block(self, x, y, width, height, block):
+        for index, row in enumerate(range(y, y + height)):
+            start = row * self.width + x
+            self.cells[start:start + width] = \
+                block[index * width:(index + 1) * width]
+        self.add_damage(x, y, width, height)
+
+    def fill(self, x, y, width, height, char):
+        rect = self.clip(x, y, width, height)
+        if rect is None:
+            return None
+        x, y, width, height = rect
+        line = array('I', [to_code(char)]) * width
+        for row in range(y, y + height):
+            start = row * self.width + x
+            self.cells[start:start + width] = line
+        self.add_damage(*rect)
+        return rect
+
+    def fill_runs(self, runs, char):
+        # Fills x, y, length triples of runs inside the grid, damaging
+        # their bounding box as a single rect
+        if not runs:
+            return
+        code = to_code(char)
+        x0, y0 = self.width, self.height
+        x1 = y1 = 0
+        for index in range(0, len(runs), 3):
+            x, y, length = runs[index], runs[index + 1], runs[index + 2]
+            start = y * self.width + x
+            self.cells[start:start + length] = array('I', [code]) * length
+            x0, x1 = min(x0, x), max(x1, x + length)
+            y0, y1 = min(y0, y), max(y1, y + 1)
+        self.add_damage(x0, y0, x1 - x0, y1 - y0)
+
+    def blit(self, x, y, lines, transparent=False):
+        x, y = int(x), int(y)
+        if lines:
+            width = max(len(line) for line in lines)
+            rect = self.clip(x, y, width, len(lines))
+            if rect is None:
+                return
+            self.add_damage(*rect)
+        for index, line in enumerate(lines):
+            row = y + index
+            if row < 0:
+                continue
+            if row >= self.height:
+                break
+            codes = array('I', map(ord, line))
+            start_col = max(x, 0)
+            end_col = min(x + len(codes), self.width)
+            if end_col <= start_col:
+                continue
+            codes = codes[start_col - x:end_col - x]
+            start = row * self.width + start_col
+            if transparent:
+                space = ord(" ")
+                for offset, code in enumerate(codes):
+                    if code != space:
+                        self.cells[start + offset] = code
+            else:
+                self.cells[start:start + len(codes)] = codes
+
+    def set_cells(self, width, height, cells):
+        if len(cells) != width * height:
+            raise ValueError("Cells do not match the size of the grid")
+        self.width = width
+        self.height = height
+        self.cells = cells
+        self.damage_all()
+
+    def clear(self, char=" "):
+        self.cells = array('I', [to_code(char)]) * (self.width * self.height)
+        self.damage_all()
+
+    def resize(self, width, height, char=" ", anchor=(0, 0)):
+        # The anchor tells where the old cells end up, (0, 0) keeps them
+        # at the top left, (0.5, 0.5) in the center and (1, 1) at the
+        # bottom right
+        width, height = int(width), int(height)
+        if width == self.width and height == self.height:
+            return
+        offset_x = round((width - self.width) * anchor[0])
+        offset_y = round((height - self.height) * anchor[1])
+        code = to_code(char)
+
+        if width == self.width:
+            # Only whole rows are added or removed, the cells are kept in
+            # place
+            if offset_y < 0:
+                del self.cells[:-offset_y * width]
+            else:
+                self.cells[0:0] = array('I', [code]) * (offset_y * width)
+            size = width * height
+            if len(self.cells) > size:
+                del self.cells[size:]
+            else:
+                missing = size - len(self.cells)
+                self.cells.extend(array('I', [code]) * missing)
+        else:
+            cells = array('I', [code]) * (width * height)
+            x0 = max(0, -offset_x)
+            x1 = min(self.width, width - offset_x)
+            for row in range(max(0, -offset_y),
+                             min(self.height, height - offset_y)):
+                src = row * self.width
+                dst = (row + offset_y) * width + offset_x
+                cells[dst + x0:dst + x1] = self.cells[src + x0:src + x1]
+            self.cells = cells
+
+        self.width = width
+        self.height = height
+        self.damage_all()
+
+    def to_string(self):
+        return "\n".join(self.get_rows()) + "\n"
+
+
+class Overlay(DamageTracker):
+    # Sparse layer with the same interface as Grid, it only stores the
+    # cells that were written since the last clear, row by row, so that
+    # clearing it costs as much as what was drawn on it.
+
+    def __init__(self, width, height):
+        self.width = int(width)
+        self.height = int(height)
+        self.rows = {}
+        self.damage = []
+
+    def __repr__(self):
+        return f"Overlay {self.width}x{self.height} " \
+            f"with {sum(len(row) for row in self.rows.values())} cells"
+
+    def get_size(self):
+        return self.width, self.height
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def get(self, x, y):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        row = self.rows.get(int(y))
+        if row is None:
+            return " "
+        return row.get(int(x), " ")
+
+    def set(self, x, y, char):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        x, y = int(x), int(y)
+        row = self.rows.get(y)
+        if row is None:
+            row = self.rows[y] = {}
+        row[x] = char or " "
+        self.add_damage(x, y, 1, 1)
+        return True
+
+    def get_row_text(self, y, start=0, end=None):
+        row = self.rows.get(int(y))
+        if not row:
+            return ""
+        end = self.width if end is None else min(end, self.width)
+        text = [" "] * (end - start)
+        for x, char in row.items():
+            if start <= x < end:
+                text[x - start] = char
+        return ''.join(text)
+
+    def get_row(self, y):
+        return self.get_row_text(y).ljust(self.width)
+
+    def blit(self, x, y, lines, transparent=False):
+        x, y = int(x), int(y)
+        for row_index, line in enumerate(lines, y):
+            if not 0 <= row_index < self.height:
+                continue
+            for column, char in enumerate(line, x):
+                if transparent and char == " ":
+                    continue
+                self.set(column, row_index, char)
+
+    def fill(self, x, y, width, height, char):
+        rect = self.clip(x, y, width, height)
+        if rect is None:
+            return None
+        x, y, width, height = rect
+        cells = dict.fromkeys(range(x, x + width), char or " ")
+        for row in range(y, y + height):
+            self.rows.setdefault(row, {}).update(cells)
+        self.add_damage(*rect)
+        return rect
+
+    def clear(self):
+        for y, row in self.rows.items():
+            if row:
+                first = min(row)
+                self.add_damage(first, y, max(row) - first + 1, 1)
+        self.rows = {}
+
+    def resize(self, width, height):
+        self.clear()
+        self.width = int(width)
+        self.height = int(height)
@@ -0,0 +1,502 @@
+# history.py
+#
+# Copyright 2023-2025 Nokse
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from array import array
+
+import zlib
+
+from .grid import to_code, to_char
+
+DEFAULT_MEMORY_LIMIT = 64 * 1024 * 1024
+
+# Changes this far behind the current position are stored compressed
+HOT_ENTRIES = 8
+
+# A copy of the whole grid is kept every this many changes, so that any
+# state can be restored from a copy and at most this many changes
+CHECKPOINT_INTERVAL = 32
+
+# Rough cost of a cell while a change is still recorded in a dict
+RECORDING_CELL_SIZE = 100
+
+
+class CellsPart():
+    # Cells written one at a time, packed as x, y, previous code point,
+    # new code point once closed
+    def __init__(self):
+        # Cell -> previous char, only the first write of a cell is kept
+        self.changes = {}
+        self.packed = None
+        self.compressed = None
+
+    def add_change(self, x, y, prev_char):
+        key = (int(x), int(y))
+        if key not in self.changes:
+            self.changes[key] = prev_char
+
+    def is_closed(self):
+        return self.changes is None
+
+    def close(self, grid):
+        # The new chars are read from the grid, so this has to happen
+        # before anything else changes the cells
+        if self.changes is None:
+            return
+        packed = array('i')
+        for (x, y), prev_char in self.changes.items():
+            packed.extend((x, y, to_code(prev_char), to_code(grid.get(x, y))))
+        self.packed = packed
+        self.changes = None
+
+    def get_packed(self):
+        if self.packed is not None:
+            return self.packed
+        packed = array('i')
+        packed.frombytes(zlib.decompress(self.compressed))
+        return packed
+
+    def compress(self):
+        if self.packed is None:
+            return
+        self.compressed = zlib.compress(self.packed.tobytes())
+        self.packed = None
+
+    def revert(self, grid):
+        packed = self.get_packed()
+        for index in range(0, len(packed), 4):
+            grid.set(packed[index], packed[index + 1],
+                     to_char(packed[index + 2]))
+
+    def apply(self, grid):
+        packed = self.get_packed()
+        for index in range(0, len(packed), 4):
+            grid.set(packed[index], packed[index + 1],
+                     to_char(packed[index + 3]))
+
+    def get_size(self):
+        if self.changes is not None:
+            return len(self.changes) * RECORDING_CELL_SIZE
+        if self.packed is not None:
+            return len(self.packed) * self.packed.itemsize
+        return len(self.compressed)
+
+    def __len__(self):
+        if self.changes is not None:
+            return len(self.changes)
+        return len(self.get_packed()) // 4
+
+
+class RectPart():
+    # A whole rectangle of cells, stored as the block before and after
+    def __init__(self, grid, x, y, width, height):
+        self.rect = (x, y, width, height)
+        self.prev = grid.get_block(x, y, width, height)
+        self.new = None
+        self.compressed = None
+
+    def is_closed(self):
+        return self.new is not None or self.compressed is not None
+
+    def close(self, grid):
+        if self.is_closed():
+            return
+        self.new = grid.get_block(*self.rect)
+
+    def get_blocks(self):
+        if self.compressed is None:
+            return self.prev, self.new
+        data = zlib.decompress(self.compressed)
+        prev = array('I')
+        prev.frombytes(data[:len(data) // 2])
+        new = array('I')
+        new.frombytes(data[len(data) // 2:])
+        return prev, new
+
+    def compress(self):
+        if self.new is None:
+            return
+        self.compressed = zlib.compress(
+            self.prev.tobytes() + self.new.tobytes())
+        self.prev = None
+        self.new = None
+
+    def revert(self, grid):
+        if grid.clip(*self.rect) == self.rect:
+            grid.set_block(*self.rect, self.get_blocks()[0])
+
+    def apply(self, grid):
+        if grid.clip(*self.rect) == self.rect:
+            grid.set_block(*self.rect, self.get_blocks()[1])
+
+    def get_size(self):
+        if self.compressed is not None:
+            return len(self.compressed)
+        size = len(self.prev) * self.prev.itemsize
+        if self.new is not None:
+            size += len(self.new) * self.new.itemsize
+        return size
+
+    def __len__(self):
+        return self.rect[2] * self.rect[3]
+
+
+class RunsPart():
+    # Horizontal runs of cells that all held the same char and were all
+    # set to the same char, as x, y, length triples
+    def __init__(self, grid, runs, char):
+        self.runs = runs
+        self.prev_code = grid.cells[runs[1] * grid.width + runs[0]]
+        self.new_code = to_code(char)
+        self.compressed = None
+
+    def is_closed(self):
+        # Closed as soon as it is added, History.seal still journals it
+        return True
+
+    def close(self, grid):
+        pass
+
+    def get_runs(self):
+        if self.compressed is None:
+            return self.runs
+        runs = array('i')
+        runs.frombytes(zlib.decompress(self.compressed))
+        return runs
+
+    def compress(self):
+        if self.compressed is not None:
+            return
+        self.compressed = zlib.compress(self.runs.tobytes())
+        self.runs = None
+
+    def fill(self, grid, char):
+        grid.fill_runs(self.get_runs(), char)
+
+    def revert(self, grid):
+        self.fill(grid, to_char(self.prev_code))
+
+    def apply(self, grid):
+        self.fill(grid, to_char(self.new_code))
+
+    def get_size(self):
+        if self.compressed is not None:
+            return len(self.compressed)
+        return len(self.runs) * self.runs.itemsize
+
+    def __len__(self):
+        runs = self.get_runs()
+        return sum(runs[index] for index in range(2, len(runs), 3))
+
+
+class ResizePart():
+    # The whole grid before the resize, redoing it resizes again
+    def __init__(self, grid, width, height, anchor):
+        self.prev_size = grid.get_size()
+        self.size = (width, height)
+        self.anchor = anchor
+        self.prev = zlib.compress(grid.cells.tobytes())
+
+    def is_closed(self):
+        return True
+
+    def close(self, grid):
+        pass
+
+    def compress(self):
+        pass
+
+    def revert(self, grid):
+        cells = array('I')
+        cells.frombytes(zlib.decompress(self.prev))
+        grid.set_cells(*self.prev_size, cells)
+
+    def apply(self, grid):
+        grid.resize(*self.size, anchor=self.anchor)
+
+    def get_size(self):
+        return len(self.prev)
+
+    def __len__(self):
+        return 0
+
+
+class Change():
+    # A named list of parts, a new part is started each time a rectangle
+    # is recorded, so that undo and redo can replay them in order
+    def __init__(self, _name):
+        self.parts = []
+        self.name = _name
+
+        # Parts already written to the journal
+        self.journaled = 0
+
+    def add_change(self, x, y, prev_char, grid):
+        if self.parts and not self.parts[-1].is_closed():
+            if isinstance(self.parts[-1], CellsPart):
+                self.parts[-1].add_change(x, y, prev_char)
+                return
+            self.parts[-1].close(grid)
+        part = CellsPart()
+        part.add_change(x, y, prev_char)
+        self.parts.append(part)
+
+    def add_rect(self, grid, x, y, width, height):
+        # Has to be called before the rectangle is written
+        self.seal(grid)
+        rect = grid.clip(x, y, width, height)
+        if rect is not None:
+            self.parts.append(RectPart(grid, *rect))
+
+    def add_runs(self, grid, runs, char):
+        # Has to be called before the runs are written
+        self.seal(grid)
+        if runs:
+            self.parts.append(RunsPart(grid, runs, char))
+
+    def add_resize(self, grid, width, height, anchor):
+        # Has to be called before the grid is resized
+        self.seal(grid)
+        self.parts.append(ResizePart(grid, width, height, anchor))
+
+    def seal(self, grid):
+        if self.parts:
+            self.parts[-1].close(grid)
+
+    def compress(self):
+        for part in self.parts:
+            part.compress()
+
+    def revert(self, grid):
+        for part in reversed(self.parts):
+            part.revert(grid)
+
+    def apply(self, grid):
+        for part in self.parts:
+            part.apply(grid)
+
+    def get_size(self):
+        return sum(part.get_size() for part in self.parts)
+
+    def __len__(self):
+        return sum(len(part) for part in self.parts)
+
+    def __repr__(self):
+        return f"The change named {self.name} has {len(self)} changes"
+
+
+class History():
+    # Linear list of changes, the ones before the position are applied to
+    # the grid and the ones after it can be redone. Indices count from the
+    # start of the session so that they stay valid when the oldest changes
+    # are discarded, the state at index i is the one after i changes.
+
+    def __init__(self, memory_limit):
+        self.changes = []
+        self.start = 0
+        self.position = 0
+
+        # Index -> (width, height, compressed cells)
+        self.checkpoints = {}
+
+        self.grid = None
+        self.memory_limit = memory_limit
+
+        # Told about every change once it is finished, undone or redone
+        self.journal = None
+
+        # Counts every edit, undo and redo, so that a save can tell if the
+        # drawing changed while it was written
+        self.edits = 0
+
+    def __repr__(self):
+        return f"History at {self.position} of {self.start}-{self.get_end()}"
+
+    def set_grid(self, grid):
+        self.grid = grid
+        self.checkpoints = {}
+
+    def clear(self):
+        self.changes = []
+        self.start = 0
+        self.position = 0
+        self.checkpoints = {}
+
+    def get_end(self):
+        return self.start + len(self.changes)
+
+    def get_change(self, index):
+        return self.changes[index - self.start]
+
+    def can_undo(self):
+        return self.position > self.start
+
+    def can_redo(self):
+        return self.position < self.get_end()
+
+    def get_undo_name(self):
+        if not self.can_undo():
+            return None
+        return self.get_change(self.position - 1).name
+
+    def get_redo_name(self):
+        if not self.can_redo():
+            return None
+        return self.get_change(self.position).name
+
+    def get_recording_change(self):
+        # Cells can only be written into the last change, and only while
+        # it is applied, an undone change has to stay as it was recorded
+        if not self.changes or self.position != self.get_end():
+            raise RuntimeError("No change is being recorded")
+        self.edits += 1
+        return self.changes[-1]
+
+    def add_change(self, x, y, prev_char):
+        self.get_recording_change().add_change(x, y, prev_char, self.grid)
+        if self.journal is not None:
+            self.journal.schedule_flush()
+
+    def add_rect(self, x, y, width, height):
+        self.get_recording_change().add_rect(self.grid, x, y, width, height)
+        if self.journal is not None:
+            self.journal.schedule_flush()
+
+    def add_runs(self, runs, char):
+        self.get_recording_change().add_runs(self.grid, runs, char)
+        if self.journal is not None:
+            self.journal.schedule_flush()
+
+    def add_resize(self, width, height, anchor):
+        self.get_recording_change().add_resize(
+            self.grid, width, height, anchor)
+        if self.journal is not None:
+            self.journal.schedule_flush()
+
+    def seal(self):
+        # Closes the part being recorded and writes the parts the journal
+        # has not seen yet, including the ones that are closed as soon as
+        # they are added, like runs and resizes
+        if not self.changes or self.position != self.get_end():
+            return
+        change = self.changes[-1]
+        change.seal(self.grid)
+        if self.journal is not None and change.journaled < len(change.parts):
+            self.journal.add_parts(change.parts[change.journaled:], False)
+        change.journaled = len(change.parts)
+
+    def push(self, change):
+        self.seal()
+
+        # A new change discards the ones that were undone
+        del self.changes[self.position - self.start:]
+        for index in [i for i in self.checkpoints if i > self.position]:
+            del self.checkpoints[index]
+
+        if self.position % CHECKPOINT_INTERVAL == 0:
+            self.add_checkpoint(self.position)
+
+        cold = self.position - HOT_ENTRIES
+        if cold >= self.start:
+            self.get_change(cold).compress()
+
+        self.changes.append(change)
+        self.position += 1
+
+        self.enforce_memory_limit()
+
+    def undo(self):
+        if not self.can_undo():
+            return False
+        self.seal()
+        self.position -= 1
+        change = self.get_change(self.position)
+        change.revert(self.grid)
+        self.edits += 1
+        if self.journal is not None:
+            self.journal.add_change(change, True)
+        return True
+
+    def redo(self):
+        if not self.can_redo():
+            return False
+        change = self.get_change(self.position)
+        change.apply(self.grid)
+        self.edits += 1
+        if self.journal is not None:
+            self.journal.add_change(change, False)
+        self.position += 1
+        return True
+
+    def jump(self, index):
+        index = max(self.start, min(index, self.get_end()))
+        self.seal()
+
+        checkpoint = self.get_nearest_checkpoint(index)
+        if (checkpoint is not None
+                and abs(checkpoint - index) < abs(self.position - index)):
+            self.load_checkpoint(checkpoint)
+
+        while self.position < index:
+            self.redo()
+        while self.position > index:
+            self.undo()
+
+    def add_checkpoint(self, index):
+        width, height = self.grid.get_size()
+        self.checkpoints[index] = (
+            width, height, zlib.compress(self.grid.cells.tobytes()))
+
+    def get_nearest_checkpoint(self, index):
+        below = index - index % CHECKPOINT_INTERVAL
+        candidates = sorted(
+            (below, below + CHECKPOINT_INTERVAL),
+            key=lambda candidate: abs(candidate - index))
+        for candidate in candidates:
+            if candidate in self.checkpoints:
+                return candidate
+        return None
+
+    def load_checkpoint(self, index):
+        width, height, data = self.checkpoints[index]
+        cells = array('I')
+        cells.frombytes(zlib.decompress(data))
+        self.grid.set_cells(width, height, cells)
+        self.position = index
+        self.edits += 1
+        if self.journal is not None:
+            self.journal.add_snapshot()
+
+    def get_memory_usage(self):
+        return sum(change.get_size() for change in self.changes) + sum(
+            len(checkpoint[2]) for checkpoint in self.checkpoints.values())
+
+    def enforce_memory_limit(self):
+        # The change being recorded is always kept, the oldest ones go
+        # first and then the ones that can be redone
+        usage = self.get_memory_usage()
+        while usage > self.memory_limit and len(self.changes) > 1:
+            if self.position > self.start:
+                usage -= self.changes.pop(0).get_size()
+                self.start += 1
+                for index in [i for i in self.checkpoints if i < self.start]:
+                    usage -= len(self.checkpoints.pop(index)[2])
+            elif self.can_redo():
+                usage -= self.changes.pop(-1).get_size()
+            else:
+                break
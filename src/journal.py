@@ -0,0 +1,289 @@
+# journal.py
+#
+# Copyright 2023-2025 Nokse
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from gi.repository import GLib
+
+from array import array
+
+import os
+import queue
+import struct
+import threading
+import zlib
+
+from .grid import Grid
+from .history import CellsPart, RectPart, RunsPart, ResizePart
+
+# Every record is a type byte and the length of what follows
+RECORD_HEADER = struct.Struct('<cI')
+
+SNAPSHOT = b'S'  # width, height, compressed cells
+CELLS = b'C'  # x, y, code point triples
+RECT = b'R'  # x, y, width, height, code points
+RUNS = b'F'  # code point, x, y, length triples
+PATH = b'P'  # path of the file the drawing is saved to
+SAVED = b'K'  # the drawing is the same as the saved file
+
+FLUSH_INTERVAL = 2
+
+# Past this size the journal is rewritten as a single snapshot
+COMPACT_SIZE = 4 * 1024 * 1024
+
+
+def encode_records(records):
+    # Snapshots are kept as a copy of the cells until they are written,
+    # so that they are compressed by the writer thread
+    data = bytearray()
+    for kind, payload in records:
+        if kind == SNAPSHOT:
+            width, height, cells = payload
+            payload = struct.pack('<ii', width, height) \
+                + zlib.compress(cells.tobytes())
+        data += RECORD_HEADER.pack(kind, len(payload))
+        data += payload
+    return data
+
+
+class Journal():
+    # Append only log of the changes made to the drawing, so that they can
+    # be recovered after a crash. Records are kept in memory and handed
+    # every few seconds to a thread, that writes them in order with a
+    # single fsync, so the disk is never waited for by the window.
+
+    def __init__(self, path):
+        self.path = path
+        self.records = []
+        # Bytes of records since the last snapshot, snapshots count as
+        # their cells
+        self.size = 0
+        self.tasks = queue.Queue()
+        self.writer = None
+        self.flush_source = None
+        self.history = None
+        self.file_path = ""
+        self.saved = True
+
+    def __repr__(self):
+        return f"Journal at {self.path} of {self.size} bytes"
+
+    def replay(self):
+        # Returns the grid and the file path of unsaved work, if any
+        try:
+            with open(self.path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return None
+
+        grid = None
+        file_path = ""
+        saved = True
+
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(data):
+            kind, length = RECORD_HEADER.unpack_from(data, offset)
+            offset += RECORD_HEADER.size
+            if offset + length > len(data):
+                # Cut short by a crash while writing
+                break
+            payload = data[offset:offset + length]
+            offset += length
+
+            try:
+                if kind == SNAPSHOT:
+                    width, height = struct.unpack_from('<ii', payload)
+                    cells = array('I')
+                    cells.frombytes(zlib.decompress(payload[8:]))
+                    grid = Grid(width, height)
+                    grid.set_cells(width, height, cells)
+                elif kind == PATH:
+                    file_path = payload.decode()
+                    continue
+                elif kind == SAVED:
+                    saved = True
+                    continue
+                elif grid is None:
+                    continue
+                elif kind == CELLS:
+                    cells = array('i')
+                    cells.frombytes(payload)
+                    for index in range(0, len(cells), 3):
+                        grid.set(cells[index], cells[index + 1],
+                                 chr(cells[index + 2]))
+                elif kind == RECT:
+                    rect = struct.unpack_from('<iiii', payload)
+                    block = array('I')
+                    block.frombytes(payload[16:])
+                    if grid.clip(*rect) == rect:
+                        grid.set_block(*rect, block)
+                elif kind == RUNS:
+                    runs = array('i')
+                    runs.frombytes(payload)
+                    char = chr(runs[0])
+                    for index in range(1, len(runs), 3):
+                        grid.fill(runs[index], runs[index + 1],
+                                  runs[index + 2], 1, char)
+            except (ValueError, struct.error, zlib.error):
+                break
+
+            saved = False
+
+        if grid is None or saved:
+            return None
+        return grid, file_path
+
+    def start(self, history, file_path, saved):
+        # Starts a new journal from the current drawing
+        self.history = history
+        self.file_path = file_path
+        self.records = []
+        self.size = 0
+        self.add_snapshot()
+        self.add_path()
+        if saved:
+            self.add_record(SAVED, b'')
+        self.compact()
+
+    def add_record(self, kind, payload, size=None):
+        self.saved = kind == SAVED
+        self.records.append((kind, payload))
+        self.size += RECORD_HEADER.size + (
+            len(payload) if size is None else size)
+        self.schedule_flush()
+
+    def schedule_flush(self):
+        if self.flush_source is None:
+            self.flush_source = GLib.timeout_add_seconds(
+                FLUSH_INTERVAL, self.on_flush_timeout)
+
+    def add_snapshot(self):
+        grid = self.history.grid
+        width, height = grid.get_size()
+        cells = grid.cells[:]
+        self.add_record(SNAPSHOT, (width, height, cells), len(cells))
+
+    def add_path(self):
+        saved = self.saved
+        self.add_record(PATH, self.file_path.encode())
+        self.saved = saved
+
+    def set_saved(self, file_path):
+        if file_path != self.file_path:
+            self.file_path = file_path
+            self.add_path()
+        self.add_record(SAVED, b'')
+
+    def add_change(self, change, reverted):
+        self.add_parts(change.parts, reverted)
+
+    def add_parts(self, parts, reverted):
+        # The grid has to be in the state right after the parts were
+        # applied or reverted
+        for part in parts:
+            if isinstance(part, ResizePart):
+                self.add_snapshot()
+                return
+
+        if reverted:
+            parts = reversed(parts)
+        for part in parts:
+            if isinstance(part, CellsPart):
+                packed = part.get_packed()
+                column = 2 if reverted else 3
+                cells = array('i')
+                for index in range(0, len(packed), 4):
+                    cells.extend((packed[index], packed[index + 1],
+                                  packed[index + column]))
+                self.add_record(CELLS, cells.tobytes())
+            elif isinstance(part, RectPart):
+                prev, new = part.get_blocks()
+                block = prev if reverted else new
+                self.add_record(
+                    RECT, struct.pack('<iiii', *part.rect) + block.tobytes())
+            elif isinstance(part, RunsPart):
+                code = part.prev_code if reverted else part.new_code
+                self.add_record(
+                    RUNS, struct.pack('<i', code) + part.get_runs().tobytes())
+
+    def on_flush_timeout(self):
+        self.flush_source = None
+        # The parts of the change being drawn recorded so far are written
+        # too, the ones after them are written by the next seal
+        self.history.seal()
+        self.flush()
+        return GLib.SOURCE_REMOVE
+
+    def flush(self):
+        if not self.records:
+            return
+        if self.size > COMPACT_SIZE:
+            self.start(self.history, self.file_path, self.saved)
+            return
+        self.run_in_writer(self.write_appended, self.records)
+        self.records = []
+
+    def compact(self):
+        # Replaces the journal with the records kept, that have to start
+        # with a snapshot
+        self.run_in_writer(self.write_compacted, self.records)
+        self.records = []
+
+    def discard(self):
+        if self.flush_source is not None:
+            GLib.source_remove(self.flush_source)
+            self.flush_source = None
+        self.records = []
+        self.run_in_writer(self.remove)
+        # Called when quitting, the journal has to be gone before exiting
+        self.tasks.join()
+
+    def run_in_writer(self, task, *args):
+        if self.writer is None:
+            self.writer = threading.Thread(
+                target=self.run_tasks, daemon=True)
+            self.writer.start()
+        self.tasks.put((task, args))
+
+    def run_tasks(self):
+        while True:
+            task, args = self.tasks.get()
+            try:
+                task(*args)
+            except OSError as error:
+                print(f"Error writing the journal: {error}")
+            self.tasks.task_done()
+
+    def write_appended(self, records):
+        with open(self.path, 'ab') as file:
+            file.write(encode_records(records))
+            file.flush()
+            os.fsync(file.fileno())
+
+    def write_compacted(self, records):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'wb') as file:
+            file.write(encode_records(records))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
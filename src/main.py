@@ -32,6 +32,10 @@ class AsciiDrawApplication(Adw.Application):
         super().__init__(application_id='io.github.nokse22.asciidraw',
                          flags=Gio.ApplicationFlags.DEFAULT_FLAGS)
 
+        self.win = None
+
+        self.connect("shutdown", self.on_quit)
+
         self.create_action(
             'quit', self.on_shutdown, ['<primary>q', '<primary>w'])
         self.create_action(
@@ -222,6 +226,11 @@ class AsciiDrawApplication(Adw.Application):
         else:
             self.quit()
 
+    def on_quit(self, *args):
+        # Quitting means that the changes were either saved or discarded
+        if self.win is not None:
+            self.win.journal.discard()
+
     def on_save_file_with_name_response(self, dialog, task, *args):
         response = dialog.choose_finish(task)
         if response == "save":
@@ -21,6 +21,8 @@ from gi.repository import Adw
 from gi.repository import Gtk
 from gi.repository import Gdk, Gio, GObject
 
+from array import array
+
 
 class Palette(GObject.GObject):
     def __init__(self, _name, _chars):
@@ -32,3 +34,26 @@ class Palette(GObject.GObject):
 
         def __repr__(self):
             return f"{self.name} with {len(self.chars)} characters"
+
+
+class CharList(GObject.GObject, Gio.ListModel):
+    # The characters of a palette as code points, the items are only made
+    # when a view asks for them, for the cells it shows
+
+    def __init__(self, chars):
+        super().__init__()
+        self.codes = array('I', map(ord, chars))
+
+    def __repr__(self):
+        return f"Char list with {len(self.codes)} characters"
+
+    def do_get_item_type(self):
+        return Gtk.StringObject.__gtype__
+
+    def do_get_n_items(self):
+        return len(self.codes)
+
+    def do_get_item(self, position):
+        if position >= len(self.codes):
+            return None
+        return Gtk.StringObject.new(chr(self.codes[position]))
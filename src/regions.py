@@ -0,0 +1,143 @@
+# regions.py
+#
+# Copyright 2023-2025 Nokse
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from array import array
+
+# Past this many damaged rects the whole grid is labeled again
+MAX_PENDING_RECTS = 64
+
+
+class RegionIndex():
+    # Labels the regions of connected cells holding the same char, the
+    # ones a fill would change. Labels are computed when first needed, when
+    # cells change only the regions touching them are labeled again: a
+    # region that has no cell next to a changed one can not have changed.
+
+    def __init__(self):
+        self.grid = None
+        self.labels = None
+        self.labeled = None
+        self.regions = {}
+        self.next_label = 0
+        self.pending = []
+
+    def __repr__(self):
+        return f"Region index with {len(self.regions)} regions"
+
+    def set_grid(self, grid):
+        if self.grid is not None:
+            self.grid.remove_damage_listener(self.on_damage)
+        self.grid = grid
+        self.grid.add_damage_listener(self.on_damage)
+        self.labels = None
+
+    def on_damage(self, rect):
+        if self.labels is None:
+            return
+        if rect is None or len(self.pending) >= MAX_PENDING_RECTS:
+            self.labels = None
+            self.pending = []
+            return
+        self.pending.append(rect)
+
+    def get_label(self, x, y):
+        if not self.grid.in_bounds(x, y):
+            return None
+        self.update()
+        return self.labels[int(y) * self.grid.width + int(x)]
+
+    def get_region(self, x, y):
+        # Runs of the region as x, y, length triples
+        label = self.get_label(x, y)
+        if label is None:
+            return array('i')
+        return self.regions[label][0]
+
+    def get_region_size(self, x, y):
+        label = self.get_label(x, y)
+        if label is None:
+            return 0
+        return self.regions[label][1]
+
+    def update(self):
+        if self.labels is None:
+            self.label_all()
+            return
+        if not self.pending:
+            return
+
+        width, height = self.grid.get_size()
+        labels = self.labels
+
+        # Regions with a cell in or next to a changed rect are dropped
+        dropped = set()
+        for x, y, rect_width, rect_height in self.pending:
+            x0, y0 = max(x - 1, 0), max(y - 1, 0)
+            x1 = min(x + rect_width + 1, width)
+            y1 = min(y + rect_height + 1, height)
+            for row in range(y0, y1):
+                dropped.update(labels[row * width + x0:row * width + x1])
+        self.pending = []
+
+        freed = []
+        for label in dropped:
+            runs = self.regions.pop(label)[0]
+            for index in range(0, len(runs), 3):
+                start = runs[index + 1] * width + runs[index]
+                length = runs[index + 2]
+                self.labeled[start:start + length] = bytes(length)
+                freed.append((runs[index + 1], start, start + length))
+
+        # The cells of a freed run can now hold different chars, each one
+        # still unlabeled starts a region
+        for y, start, end in freed:
+            self.label_cells(y, start, end)
+
+    def label_all(self):
+        width, height = self.grid.get_size()
+        self.labels = array('i', [-1]) * (width * height)
+        self.labeled = bytearray(width * height)
+        self.regions = {}
+        self.pending = []
+
+        for y in range(height):
+            self.label_cells(y, y * width, (y + 1) * width)
+
+    def label_cells(self, y, start, end):
+        row_start = y * self.grid.width
+        index = self.labeled.find(0, start, end)
+        while index != -1:
+            self.label_region(index - row_start, y)
+            index = self.labeled.find(0, index + 1, end)
+
+    def label_region(self, x, y):
+        runs = self.grid.find_region(x, y, self.labeled)
+        if not runs:
+            return
+        width = self.grid.width
+        label = self.next_label
+        self.next_label += 1
+
+        size = 0
+        for index in range(0, len(runs), 3):
+            start = runs[index + 1] * width + runs[index]
+            length = runs[index + 2]
+            self.labels[start:start + length] = array('i', [label]) * length
+            size += length
+        self.regions[label] = (runs, size)
@@ -0,0 +1,304 @@
+# renderer.py
+#
+# Copyright 2023-2025 Nokse
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from gi.repository import Gtk
+from gi.repository import GObject
+from gi.repository import Graphene
+
+import cairo
+import re
+
+from collections import OrderedDict
+
+# Rows are split into chunks of this many columns, each with its own
+# render node, so that wide canvases only record the columns in view
+CHUNK_COLUMNS = 64
+
+# Rows and chunks this far out of the viewport keep their render node, so
+# that small scrolls do not rebuild them
+ROW_CACHE_MARGIN = 32
+CHUNK_CACHE_MARGIN = 2
+
+# Spaces and empty cells draw nothing, only the runs between them are drawn
+RUN_PATTERN = re.compile('[^ \\0]+')
+
+ATLAS_COLUMNS = 16
+ATLAS_ROWS = 16
+
+
+class GlyphAtlas():
+    # Every character is rasterized once in white into a slot of a shared
+    # surface, rows are then built by copying slots. The color is applied
+    # later by the layers, so it is not part of the key. When all slots are
+    # in use the least recently used glyph gives up its slot. The surface
+    # has scale pixels per unit, so glyphs stay sharp on HiDPI displays.
+
+    def __init__(self, font, font_size, x_mul, y_mul, scale=1):
+        self.font = font
+        self.font_size = font_size
+        self.x_mul = x_mul
+        self.y_mul = y_mul
+        self.scale = scale
+
+        # Slots are two cells wide so that glyphs overhanging their cell
+        # are not cut
+        self.slot_width = 2 * x_mul
+        self.slot_height = y_mul
+
+        self.surface = cairo.ImageSurface(
+            cairo.FORMAT_ARGB32,
+            ATLAS_COLUMNS * self.slot_width * scale,
+            ATLAS_ROWS * self.slot_height * scale)
+        self.surface.set_device_scale(scale, scale)
+
+        self.capacity = ATLAS_COLUMNS * ATLAS_ROWS
+        self.slots = OrderedDict()
+        self.free_slots = list(range(self.capacity - 1, -1, -1))
+
+    def __repr__(self):
+        return f"Glyph atlas of {self.font} {self.font_size} " \
+            f"at scale {self.scale} with {len(self.slots)} glyphs"
+
+    def get_slot_origin(self, slot):
+        return (
+            (slot % ATLAS_COLUMNS) * self.slot_width,
+            (slot // ATLAS_COLUMNS) * self.slot_height)
+
+    def lookup(self, char):
+        slot = self.slots.get(char)
+        if slot is not None:
+            self.slots.move_to_end(char)
+            return slot
+
+        if self.free_slots:
+            slot = self.free_slots.pop()
+        else:
+            evicted_char, slot = self.slots.popitem(last=False)
+
+        self.rasterize(char, slot)
+        self.slots[char] = slot
+        return slot
+
+    def rasterize(self, char, slot):
+        slot_x, slot_y = self.get_slot_origin(slot)
+
+        cr = cairo.Context(self.surface)
+        cr.rectangle(slot_x, slot_y, self.slot_width, self.slot_height)
+        cr.clip()
+
+        cr.set_operator(cairo.OPERATOR_CLEAR)
+        cr.paint()
+        cr.set_operator(cairo.OPERATOR_OVER)
+
+        cr.set_source_rgb(1, 1, 1)
+        cr.select_font_face(self.font)
+        cr.set_font_size(self.font_size)
+        cr.move_to(slot_x, slot_y + self.slot_height - 5)
+        cr.show_text(char)
+
+        self.surface.flush()
+
+    def draw_run(self, cr, run, column, slots):
+        for index, char in enumerate(run):
+            slot_x, slot_y = self.get_slot_origin(slots[char])
+            x = (column + index) * self.x_mul
+            cr.set_source_surface(self.surface, x - slot_x, -slot_y)
+            cr.rectangle(x, 0, self.slot_width, self.slot_height)
+            cr.fill()
+
+    def draw_text_run(self, cr, run, column):
+        # Used for rows with more distinct characters than the atlas holds
+        cr.set_source_rgb(1, 1, 1)
+        cr.select_font_face(self.font)
+        cr.set_font_size(self.font_size)
+
+        baseline = self.slot_height - 5
+        glyphs = cr.get_scaled_font().text_to_glyphs(0, baseline, run, False)
+        if len(glyphs) == len(run):
+            glyphs = [
+                cairo.Glyph(
+                    glyph.index, (column + index) * self.x_mul, baseline)
+                for index, glyph in enumerate(glyphs)]
+            cr.show_glyphs(glyphs)
+        else:
+            cr.move_to(column * self.x_mul, baseline)
+            cr.show_text(run)
+
+
+class CanvasLayer(Gtk.Widget):
+    __gtype_name__ = 'CanvasLayer'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.x_mul = 12
+        self.y_mul = 24
+
+        self._color = 0
+
+        self.grid = None
+        self.atlas = None
+
+        # One render node per chunk of a row, keyed by (row, chunk), drawn
+        # in white at the chunk origin, None for blank chunks. The theme
+        # color is applied with a color matrix and the position with a
+        # translation, so neither rebuilds a chunk.
+        self.chunk_nodes = {}
+        self.cached_grid = None
+        self.cached_size = (0, 0)
+
+    @GObject.Property(type=float, default=0)
+    def color(self):
+        return self._color
+
+    @color.setter
+    def color(self, value):
+        self._color = value
+        self.notify('color')
+        self.queue_draw()
+
+    def set_grid(self, grid):
+        self.grid = grid
+        self.queue_draw()
+
+    def set_atlas(self, atlas):
+        self.atlas = atlas
+        self.invalidate()
+        self.queue_draw()
+
+    def invalidate(self):
+        self.chunk_nodes = {}
+
+    def update_cache(self):
+        grid = self.grid
+        if grid is not self.cached_grid or grid.get_size() != self.cached_size:
+            self.invalidate()
+            self.cached_grid = grid
+            self.cached_size = grid.get_size()
+            grid.take_damage()
+            return
+
+        for x, y, width, height in grid.take_damage():
+            first_chunk = x // CHUNK_COLUMNS
+            last_chunk = (x + width - 1) // CHUNK_COLUMNS
+            for row in range(y, y + height):
+                for chunk in range(first_chunk, last_chunk + 1):
+                    self.chunk_nodes.pop((row, chunk), None)
+
+    def get_visible_area(self):
+        x0, y0 = 0, 0
+        x1, y1 = self.get_width(), self.get_height()
+
+        scrolled_window = self.get_ancestor(Gtk.ScrolledWindow)
+        if scrolled_window is not None:
+            success, origin = scrolled_window.compute_point(
+                self, Graphene.Point().init(0, 0))
+            if success:
+                x0 = max(x0, origin.x)
+                y0 = max(y0, origin.y)
+                x1 = min(x1, origin.x + scrolled_window.get_width())
+                y1 = min(y1, origin.y + scrolled_window.get_height())
+
+        chunk_width = CHUNK_COLUMNS * self.x_mul
+        last_chunk = (self.grid.width - 1) // CHUNK_COLUMNS
+
+        first_row = max(int(y0 // self.y_mul), 0)
+        last_row = min(int(max(y1 - 1, 0) // self.y_mul), self.grid.height - 1)
+        first_chunk = max(int(x0 // chunk_width), 0)
+        last_chunk = min(int(max(x1 - 1, 0) // chunk_width), last_chunk)
+
+        return first_row, last_row, first_chunk, last_chunk
+
+    def do_snapshot(self, snapshot):
+        if self.grid is None:
+            return
+
+        self.update_cache()
+
+        first_row, last_row, first_chunk, last_chunk = \
+            self.get_visible_area()
+
+        for row, chunk in list(self.chunk_nodes):
+            if not (first_row - ROW_CACHE_MARGIN <= row
+                    <= last_row + ROW_CACHE_MARGIN
+                    and first_chunk - CHUNK_CACHE_MARGIN <= chunk
+                    <= last_chunk + CHUNK_CACHE_MARGIN):
+                del self.chunk_nodes[(row, chunk)]
+
+        color = self._color
+        snapshot.push_color_matrix(
+            Graphene.Matrix().init_scale(color, color, color),
+            Graphene.Vec4().init(0, 0, 0, 0))
+
+        for row in range(first_row, last_row + 1):
+            for chunk in range(first_chunk, last_chunk + 1):
+                key = (row, chunk)
+                if key in self.chunk_nodes:
+                    node = self.chunk_nodes[key]
+                else:
+                    node = self.build_chunk_node(row, chunk)
+                    self.chunk_nodes[key] = node
+
+                if node is None:
+                    continue
+
+                snapshot.save()
+                snapshot.translate(Graphene.Point().init(
+                    chunk * CHUNK_COLUMNS * self.x_mul, row * self.y_mul))
+                snapshot.append_node(node)
+                snapshot.restore()
+
+        snapshot.pop()
+
+    def build_chunk_node(self, row, chunk):
+        start = chunk * CHUNK_COLUMNS
+        text = self.grid.get_row_text(row, start, start + CHUNK_COLUMNS)
+
+        runs = list(RUN_PATTERN.finditer(text))
+        if not runs:
+            return None
+
+        # All the glyphs of the chunk are looked up before recording it, so
+        # that the atlas is not modified while the chunk refers to it
+        chars = set(text)
+        chars.discard(' ')
+        chars.discard('\0')
+
+        if len(chars) <= self.atlas.capacity:
+            slots = {char: self.atlas.lookup(char) for char in chars}
+        else:
+            slots = None
+
+        # Glyphs can overhang their cell, so the chunk is recorded one
+        # slot wider than its columns
+        chunk_snapshot = Gtk.Snapshot()
+        cr = chunk_snapshot.append_cairo(
+            Graphene.Rect().init(
+                0, 0, len(text) * self.x_mul + self.atlas.slot_width,
+                self.y_mul))
+
+        for run in runs:
+            if slots is None:
+                self.atlas.draw_text_run(cr, run.group(), run.start())
+            else:
+                self.atlas.draw_run(cr, run.group(), run.start(), slots)
+
+        del cr
+
+        return chunk_snapshot.to_node()
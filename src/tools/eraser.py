@@ -20,7 +20,7 @@
 from gi.repository import Gtk
 from gi.repository import GObject
 
-from .tool import Tool
+from .tool import Tool, get_line_cells
 
 from gettext import gettext as _
 
@@ -29,14 +29,6 @@ class Eraser(Tool):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self.canvas.drag_gesture.connect("drag-begin", self.on_drag_begin)
-        self.canvas.drag_gesture.connect("drag-update", self.on_drag_follow)
-        self.canvas.drag_gesture.connect("drag-end", self.on_drag_end)
-
-        self.canvas.click_gesture.connect("pressed", self.on_click_pressed)
-        self.canvas.click_gesture.connect("released", self.on_click_released)
-        self.canvas.click_gesture.connect("stopped", self.on_click_stopped)
-
         builder = Gtk.Builder.new_from_resource(
             "/io/github/nokse22/asciidraw/ui/eraser_sidebar.ui")
         self._sidebar = builder.get_object("eraser_stack_page")
@@ -48,8 +40,7 @@ class Eraser(Tool):
         self.x_mul = 12
         self.y_mul = 24
 
-        self.end_x = 0
-        self.end_y = 0
+        self.last_cell = (0, 0)
 
         self._size = 1
 
@@ -65,49 +56,23 @@ class Eraser(Tool):
         self.notify('size')
 
     def on_drag_begin(self, gesture, start_x, start_y):
-        if not self._active:
-            return
         self.start_x = start_x
         self.start_y = start_y
 
-        self.canvas.add_undo_action(_("Eraser"))
+        self.last_cell = (start_x // self.x_mul, start_y // self.y_mul)
 
-    def on_drag_follow(self, gesture, end_x, end_y):
-        if not self._active:
-            return
+        self.canvas.add_undo_action(_("Eraser"))
 
-        start_x_char = self.start_x // self.x_mul
-        start_y_char = self.start_y // self.y_mul
+    def on_drag_samples(self, gesture, samples):
+        for end_x, end_y in samples:
+            cell = ((self.start_x + end_x) // self.x_mul,
+                    (self.start_y + end_y) // self.y_mul)
 
-        width = int((end_x + self.start_x) // self.x_mul - start_x_char)
-        height = int((end_y + self.start_y) // self.y_mul - start_y_char)
+            for x_coord, y_coord in get_line_cells(*self.last_cell, *cell):
+                for delta in self.brush_sizes[int(self._size - 1)]:
+                    self.canvas.set_char_at(
+                        x_coord + delta[0], y_coord + delta[1], " ", True)
 
-        self.end_x = width * self.x_mul
-        self.end_y = height * self.y_mul
+            self.last_cell = cell
 
-        x_coord = (self.start_x + self.end_x)/self.x_mul
-        y_coord = (self.start_y + self.end_y)/self.y_mul
-        for delta in self.brush_sizes[int(self._size - 1)]:
-            self.canvas.set_char_at(
-                x_coord + delta[0], y_coord + delta[1], " ", True)
         self.canvas.update()
-
-    def on_drag_end(self, gesture, delta_x, delta_y):
-        if not self._active:
-            return
-        pass
-
-    def on_click_pressed(self, click, arg, x, y):
-        if not self._active:
-            return
-        pass
-
-    def on_click_stopped(self, click):
-        if not self._active:
-            return
-        pass
-
-    def on_click_released(self, click, arg, x, y):
-        if not self._active:
-            return
-        pass
@@ -17,8 +17,6 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-from gi.repository import GObject
-
 from .tool import Tool
 
 from gettext import gettext as _
@@ -30,10 +28,6 @@ class FilledRectangle(Tool):
 
         self._active = False
 
-        self.canvas.drag_gesture.connect("drag-begin", self.on_drag_begin)
-        self.canvas.drag_gesture.connect("drag-update", self.on_drag_follow)
-        self.canvas.drag_gesture.connect("drag-end", self.on_drag_end)
-
         self.start_x = 0
         self.start_y = 0
 
@@ -48,27 +42,16 @@ class FilledRectangle(Tool):
         self.prev_x = 0
         self.prev_y = 0
 
-    @GObject.Property(type=bool, default=False)
-    def active(self):
-        return self._active
-
-    @active.setter
-    def active(self, value):
-        self._active = value
-        self.notify('active')
+        self.button = 0
 
     def on_drag_begin(self, gesture, start_x, start_y):
-        if not self._active:
-            return
         self.start_x = start_x
         self.start_y = start_y
+        # Drag updates can be handed over outside of the gesture callbacks,
+        # when the gesture has no current button anymore
+        self.button = gesture.get_current_button()
 
-    def on_drag_follow(self, gesture, end_x, end_y):
-        if not self._active:
-            return
-
-        button = gesture.get_current_button()
-
+    def on_drag_update(self, gesture, end_x, end_y):
         start_x_char = self.start_x // self.x_mul
         start_y_char = self.start_y // self.y_mul
 
@@ -94,21 +77,16 @@ class FilledRectangle(Tool):
             start_y_char -= height
         height += 1
 
-        if button == 1:
+        if self.button == 1:
             self.draw_filled_rectangle(
                 start_x_char, start_y_char, width, height, False)
-        elif button == 3:
+        elif self.button == 3:
             self.draw_inverted_filled_rectangle(
                 start_x_char, start_y_char, width, height, False)
 
     def on_drag_end(self, gesture, delta_x, delta_y):
-        if not self._active:
-            return
-
         self.canvas.clear_preview()
 
-        button = gesture.get_current_button()
-
         start_x_char = self.start_x // self.x_mul
         start_y_char = self.start_y // self.y_mul
         width = int((delta_x + self.start_x) // self.x_mul - start_x_char)
@@ -128,38 +106,23 @@ class FilledRectangle(Tool):
             start_y_char -= height
         height += 1
 
-        if button == 1:
+        if self.button == 1:
             self.draw_filled_rectangle(
                 start_x_char, start_y_char, width, height, True)
-        elif button == 3:
+        elif self.button == 3:
             self.draw_inverted_filled_rectangle(
                 start_x_char, start_y_char, width, height, True)
 
     def draw_filled_rectangle(self, start_x_char, start_y_char, width, height, draw):
 
-        for x in range(width):
-            self.canvas.draw_primary_at(
-                start_x_char + x, start_y_char, draw)
-
-        # Draw the bottom border
-        for x in range(width):
-            self.canvas.draw_primary_at(
-                start_x_char + x, start_y_char + height - 1, draw)
-
-        # Draw the left border (avoid filling the corners)
-        for y in range(1, height - 1):
-            self.canvas.draw_primary_at(start_x_char, start_y_char + y, draw)
-
-        # Draw the right border (avoid filling the corners)
-        for y in range(1, height - 1):
-            self.canvas.draw_primary_at(
-                start_x_char + width - 1, start_y_char + y, draw)
+        self.canvas.fill_rect(
+            start_x_char, start_y_char, width, height,
+            self.canvas.primary_char, draw)
 
         # Fill the inside of the rectangle
-        for y in range(1, height - 1):
-            for x in range(1, width - 1):
-                self.canvas.draw_secondary_at(
-                    start_x_char + x, start_y_char + y, draw)
+        self.canvas.fill_rect(
+            start_x_char + 1, start_y_char + 1, width - 2, height - 2,
+            self.canvas.secondary_char, draw)
 
         if draw:
             self.canvas.update()
@@ -168,30 +131,14 @@ class FilledRectangle(Tool):
 
     def draw_inverted_filled_rectangle(self, start_x_char, start_y_char, width, height, draw):
 
-        for x in range(width):
-            self.canvas.draw_secondary_at(
-                start_x_char + x, start_y_char, draw)
-
-        # Draw the bottom border
-        for x in range(width):
-            self.canvas.draw_secondary_at(
-                start_x_char + x, start_y_char + height - 1, draw)
-
-        # Draw the left border (avoid filling the corners)
-        for y in range(1, height - 1):
-            self.canvas.draw_secondary_at(
-                start_x_char, start_y_char + y, draw)
-
-        # Draw the right border (avoid filling the corners)
-        for y in range(1, height - 1):
-            self.canvas.draw_secondary_at(
-                start_x_char + width - 1, start_y_char + y, draw)
+        self.canvas.fill_rect(
+            start_x_char, start_y_char, width, height,
+            self.canvas.secondary_char, draw)
 
         # Fill the inside of the rectangle
-        for y in range(1, height - 1):
-            for x in range(1, width - 1):
-                self.canvas.draw_primary_at(
-                    start_x_char + x, start_y_char + y, draw)
+        self.canvas.fill_rect(
+            start_x_char + 1, start_y_char + 1, width - 2, height - 2,
+            self.canvas.primary_char, draw)
 
         if draw:
             self.canvas.update()
@@ -17,8 +17,6 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-from gi.repository import GObject
-
 from .tool import Tool
 
 from gettext import gettext as _
@@ -30,10 +28,6 @@ class Fill(Tool):
 
         self._active = False
 
-        self.canvas.click_gesture.connect("pressed", self.on_click_pressed)
-        self.canvas.click_gesture.connect("released", self.on_click_released)
-        self.canvas.click_gesture.connect("stopped", self.on_click_stopped)
-
         self.start_x = 0
         self.start_y = 0
 
@@ -45,19 +39,46 @@ class Fill(Tool):
 
         self._size = 1
 
-    @GObject.Property(type=bool, default=False)
-    def active(self):
-        return self._active
+        # Runs shown in the preview, they are only drawn again when the
+        # hovered region is a different one
+        self.hovered_runs = None
 
-    @active.setter
-    def active(self, value):
-        self._active = value
-        self.notify('active')
+    def on_active_changed(self, value):
+        if not value:
+            self.clear_hover()
 
-    def on_click_pressed(self, click, arg, x, y):
-        if not self._active:
+    def on_motion(self, controller, x, y):
+        x_char = int(x / self.x_mul)
+        y_char = int(y / self.y_mul)
+
+        runs = self.canvas.region_index.get_region(x_char, y_char)
+        if runs is self.hovered_runs:
+            return
+
+        self.canvas.clear_preview()
+        self.hovered_runs = runs
+
+        char = self.canvas.get_selected_char() or " "
+        for index in range(0, len(runs), 3):
+            self.canvas.preview.fill(
+                runs[index], runs[index + 1], runs[index + 2], 1, char)
+        self.canvas.update_preview()
+
+        size = self.canvas.region_index.get_region_size(x_char, y_char)
+        self.canvas.set_tooltip_text(
+            _("{} cells").format(size) if size else None)
+
+    def on_leave(self, controller):
+        self.clear_hover()
+
+    def clear_hover(self):
+        if self.hovered_runs is None:
             return
+        self.hovered_runs = None
+        self.canvas.clear_preview()
+        self.canvas.set_tooltip_text(None)
 
+    def on_click_pressed(self, click, arg, x, y):
         x_char = int(x / self.x_mul)
         y_char = int(y / self.y_mul)
 
@@ -72,40 +93,19 @@ class Fill(Tool):
             flood_fill(
                 self.canvas, x_char, y_char, self.canvas.get_unselected_char())
 
+        self.hovered_runs = None
+        self.canvas.clear_preview()
         self.canvas.update()
 
-    def on_click_stopped(self, click):
-        if not self._active:
-            return
-        pass
-
-    def on_click_released(self, click, arg, x, y):
-        if not self._active:
-            return
-        pass
-
 
 def flood_fill(canvas, start_x, start_y, replacement_char):
+    if replacement_char == "":
+        replacement_char = " "
+
     target_char = canvas.get_char_at(start_x, start_y)
 
-    if target_char == replacement_char:
+    if target_char is None or target_char == replacement_char:
         return
 
-    rows, cols = canvas.get_canvas_size()
-
-    stack = [(start_x, start_y)]
-
-    while stack:
-        x, y = stack.pop()
-
-        if canvas.get_char_at(x, y) == target_char:
-            canvas.set_char_at(x, y, replacement_char, True)
-
-            if x > 0:
-                stack.append((x - 1, y))
-            if x < rows - 1:
-                stack.append((x + 1, y))
-            if y > 0:
-                stack.append((x, y - 1))
-            if y < cols - 1:
-                stack.append((x, y + 1))
+    runs = canvas.drawing.find_region(start_x, start_y)
+    canvas.fill_runs(runs, replacement_char)
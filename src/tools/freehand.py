@@ -19,7 +19,7 @@
 
 from gi.repository import GObject, Gtk
 
-from .tool import Tool
+from .tool import Tool, get_line_cells
 
 from gettext import gettext as _
 
@@ -28,9 +28,6 @@ class Freehand(Tool):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self.canvas.drag_gesture.connect("drag-begin", self.on_drag_begin)
-        self.canvas.drag_gesture.connect("drag-update", self.on_drag_follow)
-
         builder = Gtk.Builder.new_from_resource(
             "/io/github/nokse22/asciidraw/ui/freehand_sidebar.ui")
         self._sidebar = builder.get_object("freehand_stack_page")
@@ -43,8 +40,8 @@ class Freehand(Tool):
         self.x_mul = 12
         self.y_mul = 24
 
-        self.end_x = 0
-        self.end_y = 0
+        self.last_cell = (0, 0)
+        self.button = 0
 
         self._size = 1
         self._char = '#'
@@ -61,38 +58,32 @@ class Freehand(Tool):
         self.notify('size')
 
     def on_drag_begin(self, gesture, start_x, start_y):
-        if not self._active:
-            return
-
         self.start_x = start_x
         self.start_y = start_y
 
-        self.canvas.add_undo_action(_("Freehand"))
-
-    def on_drag_follow(self, gesture, end_x, end_y):
-        if not self._active:
-            return
-
-        button = gesture.get_current_button()
+        self.last_cell = (start_x // self.x_mul, start_y // self.y_mul)
+        # Samples can be handed over outside of the gesture callbacks, when
+        # the gesture has no current button anymore
+        self.button = gesture.get_current_button()
 
-        start_x_char = self.start_x // self.x_mul
-        start_y_char = self.start_y // self.y_mul
-
-        width = int((end_x + self.start_x) // self.x_mul - start_x_char)
-        height = int((end_y + self.start_y) // self.y_mul - start_y_char)
-
-        self.end_x = width * self.x_mul
-        self.end_y = height * self.y_mul
-
-        x_coord = (self.start_x + self.end_x)//self.x_mul
-        y_coord = (self.start_y + self.end_y)//self.y_mul
+        self.canvas.add_undo_action(_("Freehand"))
 
-        for delta in self.brush_sizes[int(self._size - 1)]:
-            if button == 1:
-                self.canvas.draw_at(
-                    x_coord + delta[0], y_coord + delta[1])
-            elif button == 3:
-                self.canvas.draw_inverted_at(
-                    x_coord + delta[0], y_coord + delta[1])
+    def on_drag_samples(self, gesture, samples):
+        # Samples can be cells apart on fast drags, the gaps between them
+        # are filled with a line
+        for end_x, end_y in samples:
+            cell = ((self.start_x + end_x) // self.x_mul,
+                    (self.start_y + end_y) // self.y_mul)
+
+            for x_coord, y_coord in get_line_cells(*self.last_cell, *cell):
+                for delta in self.brush_sizes[int(self._size - 1)]:
+                    if self.button == 1:
+                        self.canvas.draw_at(
+                            x_coord + delta[0], y_coord + delta[1])
+                    elif self.button == 3:
+                        self.canvas.draw_inverted_at(
+                            x_coord + delta[0], y_coord + delta[1])
+
+            self.last_cell = cell
 
         self.canvas.update()
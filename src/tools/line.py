@@ -35,10 +35,6 @@ class Line(Tool):
         self._arrow = False
         self._line_type = 0
 
-        self.canvas.drag_gesture.connect("drag-begin", self.on_drag_begin)
-        self.canvas.drag_gesture.connect("drag-update", self.on_drag_follow)
-        self.canvas.drag_gesture.connect("drag-end", self.on_drag_end)
-
         builder = Gtk.Builder.new_from_resource(
             "/io/github/nokse22/asciidraw/ui/line_sidebar.ui")
         self._sidebar = builder.get_object("line_stack_page")
@@ -95,9 +91,6 @@ class Line(Tool):
         self.notify('style')
 
     def on_drag_begin(self, gesture, start_x, start_y):
-        if not self._active:
-            return
-
         self.start_x = start_x
         self.start_y = start_y
 
@@ -108,10 +101,16 @@ class Line(Tool):
             self.prev_prev_pos = [start_x_char, start_y_char]
             self.prev_pos = [start_x_char, start_y_char]
 
-    def on_drag_follow(self, gesture, end_x, end_y):
-        if not self._active:
-            return
+    def on_drag_samples(self, gesture, samples):
+        # A freehand line follows every sample, the other lines only go to
+        # where the pointer is now
+        if self._line_type == 2:
+            for end_x, end_y in samples:
+                self.on_drag_update(gesture, end_x, end_y)
+        else:
+            self.on_drag_update(gesture, *samples[-1])
 
+    def on_drag_update(self, gesture, end_x, end_y):
         start_x_char = self.start_x // self.x_mul
         start_y_char = self.start_y // self.y_mul
 
@@ -142,9 +141,6 @@ class Line(Tool):
         self.prev_line_pos = [end_x, end_y]
 
     def on_drag_end(self, gesture, delta_x, delta_y):
-        if not self._active:
-            return
-
         self.canvas.clear_preview()
 
         start_x_char = self.start_x // self.x_mul
@@ -24,19 +24,12 @@ class Picker(Tool):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self.canvas.click_gesture.connect("pressed", self.on_click_pressed)
-        self.canvas.click_gesture.connect("released", self.on_click_released)
-        self.canvas.click_gesture.connect("stopped", self.on_click_stopped)
-
         self.flip = False
 
         self.x_mul = 12
         self.y_mul = 24
 
     def on_click_pressed(self, click, arg, x, y):
-        if not self._active:
-            return
-
         if self.flip:
             if self.drawing_area_width == 0:
                 self.update_area_width()
@@ -46,13 +39,3 @@ class Picker(Tool):
 
         char = self.canvas.get_char_at(x_char, y_char)
         self.canvas.set_selected_char(char)
-
-    def on_click_stopped(self, click):
-        if not self._active:
-            return
-        pass
-
-    def on_click_released(self, click, arg, x, y):
-        if not self._active:
-            return
-        pass
@@ -28,10 +28,6 @@ class Rectangle(Tool):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self.canvas.drag_gesture.connect("drag-begin", self.on_drag_begin)
-        self.canvas.drag_gesture.connect("drag-update", self.on_drag_follow)
-        self.canvas.drag_gesture.connect("drag-end", self.on_drag_end)
-
         self.flip = False
         self.start_x = 0
         self.start_y = 0
@@ -57,16 +53,10 @@ class Rectangle(Tool):
         self.notify('style')
 
     def on_drag_begin(self, gesture, start_x, start_y):
-        if not self._active:
-            return
-
         self.start_x = start_x
         self.start_y = start_y
 
-    def on_drag_follow(self, gesture, end_x, end_y):
-        if not self._active:
-            return
-
+    def on_drag_update(self, gesture, end_x, end_y):
         if self.flip:
             end_x = - end_x
         start_x_char = self.start_x // self.x_mul
@@ -94,9 +84,6 @@ class Rectangle(Tool):
             start_x_char, start_y_char, width, height, False)
 
     def on_drag_end(self, gesture, delta_x, delta_y):
-        if not self._active:
-            return
-
         self.canvas.clear_preview()
 
         if self.flip:
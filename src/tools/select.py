@@ -31,14 +31,6 @@ class Select(Tool):
         super().__init__(*args, **kwargs)
         self._style = 0
 
-        self.canvas.drag_gesture.connect("drag-begin", self.on_drag_begin)
-        self.canvas.drag_gesture.connect("drag-update", self.on_drag_follow)
-        self.canvas.drag_gesture.connect("drag-end", self.on_drag_end)
-
-        self.canvas.click_gesture.connect("pressed", self.on_click_pressed)
-        self.canvas.click_gesture.connect("released", self.on_click_released)
-        self.canvas.click_gesture.connect("stopped", self.on_click_stopped)
-
         builder = Gtk.Builder.new_from_resource(
             "/io/github/nokse22/asciidraw/ui/move_sidebar.ui")
         self._sidebar = builder.get_object("move_stack_page")
@@ -103,12 +95,11 @@ class Select(Tool):
         self.selection_delta_char_x = 0
         self.selection_delta_char_y = 0
 
+        self.has_selection = False
+
         self.update_selection()
 
     def on_drag_begin(self, gesture, this_x, this_y):
-        if not self._active:
-            return
-
         if gesture.get_last_event().get_modifier_state() == 4:  # CONTROL MASK
             self.is_duplicating = True
         else:
@@ -140,7 +131,7 @@ class Select(Tool):
                 self.moved_text.append(line)
 
             if not self.is_duplicating:
-                self.delete_selection()
+                self.clear_selection()
 
         else:
             self.selection_start_x_char = this_x // self.x_mul
@@ -151,10 +142,7 @@ class Select(Tool):
 
             self.is_dragging = False
 
-    def on_drag_follow(self, gesture, delta_x, delta_y):
-        if not self._active:
-            return
-
+    def on_drag_update(self, gesture, delta_x, delta_y):
         if self.is_dragging:
             new_delta_x = (
                 (self.drag_start_x + delta_x)
@@ -198,9 +186,6 @@ class Select(Tool):
         self.selection.set_visible(True)
 
     def on_drag_end(self, gesture, delta_x, delta_y):
-        if not self._active:
-            return
-
         if self.is_dragging:
             self.selection_start_x_char += self.dragging_delta_char_x
             self.selection_start_y_char += self.dragging_delta_char_y
@@ -228,21 +213,12 @@ class Select(Tool):
         self.has_selection = True
 
     def on_click_pressed(self, click, arg, x, y):
-        if not self._active:
-            return
-
         self.click_released = False
 
     def on_click_released(self, click, arg, x, y):
-        if not self._active:
-            return
-
         self.click_released = True
 
     def on_click_stopped(self, click):
-        if not self._active:
-            return
-
         if not self.click_released:
             return
 
@@ -306,7 +282,7 @@ class Select(Tool):
                     ) or " ")
             self.moved_text.append(line)
 
-        self.delete_selection()
+        self.clear_selection()
 
         if angle == 90:
             self.moved_text = list(zip(*self.moved_text[::-1]))
@@ -329,7 +305,7 @@ class Select(Tool):
                 self.selection_delta_char_x,
                 self.selection_delta_char_y)
 
-        self.delete_selection()
+        self.clear_selection()
 
         self.canvas.draw_text(
             start_x_char + 1,
@@ -344,6 +320,12 @@ class Select(Tool):
         self.moved_text = []
 
     def delete_selection(self, *args):
+        if not self.has_selection:
+            return
+        self.canvas.add_undo_action(_("Delete"))
+        self.clear_selection()
+
+    def clear_selection(self):
         start_x_char, start_y_char, width, height = self.translate(
                 self.selection_start_x_char,
                 self.selection_start_y_char,
@@ -351,14 +333,8 @@ class Select(Tool):
                 self.selection_delta_char_y
         )
 
-        for y in range(1, int(height)):
-            for x in range(1, int(width)):
-                self.canvas.set_char_at(
-                    start_x_char + x,
-                    start_y_char + y,
-                    ' ',
-                    True
-                )
+        self.canvas.clear_rect(
+            start_x_char + 1, start_y_char + 1, width - 1, height - 1, True)
 
         self.canvas.update()
 
@@ -392,16 +368,9 @@ class Select(Tool):
                 self.selection_delta_char_y
         )
 
-        selected_text = ""
-
-        for y in range(1, int(height)):
-            line = ""
-            for x in range(1, int(width)):
-                line += self.canvas.get_char_at(
-                        start_x_char + x,
-                        start_y_char + y
-                    ) or " "
-            selected_text += line + "\n"
+        selected_text = "".join(
+            line + "\n" for line in self.canvas.copy_rect(
+                start_x_char + 1, start_y_char + 1, width - 1, height - 1))
 
         clipboard = Gdk.Display().get_default().get_clipboard()
         clipboard.set(selected_text)
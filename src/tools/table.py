@@ -30,12 +30,6 @@ class Table(Tool):
         super().__init__(*args, **kwargs)
         self._style = 0
 
-        self.canvas.drag_gesture.connect("drag-begin", self.on_drag_begin)
-        self.canvas.drag_gesture.connect("drag-update", self.on_drag_follow)
-        self.canvas.drag_gesture.connect("drag-end", self.on_drag_end)
-
-        self.canvas.click_gesture.connect("pressed", self.on_click_pressed)
-
         builder = Gtk.Builder.new_from_resource(
             "/io/github/nokse22/asciidraw/ui/table_sidebar.ui")
         self._sidebar = builder.get_object("table_stack_page")
@@ -77,16 +71,10 @@ class Table(Tool):
         self.notify('style')
 
     def on_drag_begin(self, gesture, start_x, start_y):
-        if not self._active:
-            return
-
         self.drag_start_x = start_x
         self.drag_start_y = start_y
 
-    def on_drag_follow(self, gesture, x, y):
-        if not self._active:
-            return
-
+    def on_drag_update(self, gesture, x, y):
         self.drag_x = int((x + self.drag_start_x) // self.x_mul - self.drag_start_x// self.x_mul)
         self.drag_y = int((y + self.drag_start_y) // self.y_mul - self.drag_start_y// self.y_mul)
 
@@ -94,9 +82,6 @@ class Table(Tool):
         self.preview()
 
     def on_drag_end(self, gesture, delta_x, delta_y):
-        if not self._active:
-            return
-
         self.table_x += self.drag_x
         self.table_y += self.drag_y
 
@@ -104,9 +89,6 @@ class Table(Tool):
         self.drag_y = 0
 
     def on_click_pressed(self, click, arg, x, y):
-        if not self._active:
-            return
-
         self.table_x = int(x / self.x_mul)
         self.table_y = int(y / self.y_mul)
         self.canvas.clear_preview()
@@ -164,9 +146,7 @@ class Table(Tool):
         else:  # not divided
             height = 2 + self.rows_number
 
-        for y in range(height):
-            for x in range(width):
-                self.canvas.set_char_at(table_x + x, table_y + y, ' ', draw)
+        self.canvas.clear_rect(table_x, table_y, width, height, draw)
 
         self.canvas.draw_rectangle(table_x, table_y, width, height, draw)
 
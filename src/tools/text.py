@@ -20,10 +20,9 @@
 from gi.repository import Gtk
 from gi.repository import GObject
 
-import pyfiglet
-import emoji
-
 from .tool import Tool
+from ..emoji_table import remove_emoji
+from ..figlet import FigletRenderer, PreviewQueue, PREVIEW_TEXT
 
 
 class Text(Tool):
@@ -31,12 +30,6 @@ class Text(Tool):
         super().__init__(*args, **kwargs)
         self._style = 0
 
-        self.canvas.drag_gesture.connect("drag-begin", self.on_drag_begin)
-        self.canvas.drag_gesture.connect("drag-update", self.on_drag_follow)
-        self.canvas.drag_gesture.connect("drag-end", self.on_drag_end)
-
-        self.canvas.click_gesture.connect("pressed", self.on_click_pressed)
-
         builder = Gtk.Builder.new_from_resource("/io/github/nokse22/asciidraw/ui/text_sidebar.ui")
         self._sidebar = builder.get_object("text_stack_page")
         self.text_entry_buffer = builder.get_object("text_entry_buffer")
@@ -68,15 +61,21 @@ class Text(Tool):
 
         self.selected_font = "Normal"
 
+        # The rows show the font name until the chooser is first opened,
+        # then the previews are rendered in the background
+        self.font_labels = {}
         for font in self.font_list:
-            if font == "Normal":
-                text = "font 123"
-            else:
-                text = pyfiglet.figlet_format("font 123", font=font)
+            text = PREVIEW_TEXT if font == "Normal" else font
             font_text_view = Gtk.Label(css_classes=["font-preview"], name=font)
 
             font_text_view.set_label(text)
             self.font_box.append(font_text_view)
+            self.font_labels[font] = font_text_view
+
+        self.renderer = FigletRenderer()
+
+        self.preview_queue = PreviewQueue(
+            self.font_list[1:], self.on_font_preview)
 
         self.start_x = 0
         self.start_y = 0
@@ -151,14 +150,10 @@ class Text(Tool):
         self.notify('text')
 
     def on_drag_begin(self, gesture, start_x, start_y):
-        if not self._active: return
-
         self.drag_start_x = start_x
         self.drag_start_y = start_y
 
-    def on_drag_follow(self, gesture, x, y):
-        if not self._active: return
-
+    def on_drag_update(self, gesture, x, y):
         self.drag_x = int((x + self.drag_start_x) // self.x_mul - self.drag_start_x// self.x_mul)
         self.drag_y = int((y + self.drag_start_y) // self.y_mul - self.drag_start_y// self.y_mul)
 
@@ -166,8 +161,6 @@ class Text(Tool):
         self.preview_text()
 
     def on_drag_end(self, gesture, delta_x, delta_y):
-        if not self._active: return
-
         self.text_x += self.drag_x
         self.text_y += self.drag_y
 
@@ -175,8 +168,6 @@ class Text(Tool):
         self.drag_y = 0
 
     def on_click_pressed(self, click, arg, x, y):
-        if not self._active: return
-
         self.text_x = int(x / self.x_mul)
         self.text_y = int(y / self.y_mul)
 
@@ -187,11 +178,8 @@ class Text(Tool):
         self.canvas.add_undo_action(_("Text"))
         self.canvas.clear_preview()
 
-        text = self._text
-        if self.vertical_check.get_active():
-            text = "\n".join(text)
-        if self.selected_font != "Normal":
-            text = pyfiglet.figlet_format(text, font=self.selected_font)
+        text = self.renderer.render(
+            self._text, self.selected_font, self.vertical_check.get_active())
 
         self.canvas.draw_text(self.text_x + self.drag_x, self.text_y + self.drag_y, text, self._transparent, True)
         self.canvas.update()
@@ -199,11 +187,8 @@ class Text(Tool):
     def preview_text(self, *args):
         self.canvas.clear_preview()
 
-        text = self._text
-        if self.vertical_check.get_active():
-            text = "\n".join(text)
-        if self.selected_font != "Normal":
-            text = pyfiglet.figlet_format(text, font=self.selected_font)
+        text = self.renderer.render(
+            self._text, self.selected_font, self.vertical_check.get_active())
 
         self.canvas.draw_text(self.text_x + self.drag_x, self.text_y + self.drag_y, text, self._transparent, False)
 
@@ -216,7 +201,7 @@ class Text(Tool):
     def on_text_inserted(self, buffer, loc, text, length):
         self.text_entry_buffer.handler_block(self.insert_text_signal)
 
-        filtered = emoji.replace_emoji(text, replace="")
+        filtered = remove_emoji(text)
 
         if filtered != text:
             buffer.stop_emission("insert-text")
@@ -230,8 +215,12 @@ class Text(Tool):
 
         self.text_entry_buffer.handler_unblock(self.insert_text_signal)
 
+    def on_font_preview(self, font, text):
+        self.font_labels[font].set_label(text)
+
     def show_font_selection(self, *args):
         self.text_sidebar_stack.set_visible_child_name("font_chooser")
+        self.preview_queue.start()
 
         self.previous_font = self.font_box.get_selected_row()
 
@@ -20,6 +20,28 @@
 from gi.repository import GObject
 
 
+def get_line_cells(x0, y0, x1, y1):
+    # Bresenham line between two cells, both ends included
+    x0, y0, x1, y1 = int(x0), int(y0), int(x1), int(y1)
+    delta_x = abs(x1 - x0)
+    delta_y = -abs(y1 - y0)
+    step_x = 1 if x0 < x1 else -1
+    step_y = 1 if y0 < y1 else -1
+    error = delta_x + delta_y
+
+    cells = [(x0, y0)]
+    while (x0, y0) != (x1, y1):
+        double_error = 2 * error
+        if double_error >= delta_y:
+            error += delta_y
+            x0 += step_x
+        if double_error <= delta_x:
+            error += delta_x
+            y0 += step_y
+        cells.append((x0, y0))
+    return cells
+
+
 class Tool(GObject.GObject):
     def __init__(self, _canvas, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -55,6 +77,10 @@ class Tool(GObject.GObject):
     @active.setter
     def active(self, value):
         self._active = value
+        if value:
+            self.canvas.set_active_tool(self)
+        elif self.canvas.active_tool is self:
+            self.canvas.set_active_tool(None)
         if self._stack_page:
             self._stack_page.set_visible(value)
         self.notify('active')
@@ -73,6 +99,37 @@ class Tool(GObject.GObject):
     def on_active_changed(self, value):
         pass
 
+    # Input from the canvas, only the active tool receives it
+
+    def on_drag_begin(self, gesture, x, y):
+        pass
+
+    def on_drag_update(self, gesture, x, y):
+        pass
+
+    def on_drag_samples(self, gesture, samples):
+        # Drag updates are collected by the canvas and handed over once per
+        # frame, tools that only need where the pointer is now get the last
+        self.on_drag_update(gesture, *samples[-1])
+
+    def on_drag_end(self, gesture, x, y):
+        pass
+
+    def on_click_pressed(self, click, arg, x, y):
+        pass
+
+    def on_click_released(self, click, arg, x, y):
+        pass
+
+    def on_click_stopped(self, click):
+        pass
+
+    def on_motion(self, controller, x, y):
+        pass
+
+    def on_leave(self, controller):
+        pass
+
     def add_sidebar_to(self, stack):
         if self._sidebar is None:
             print("Missing sidebar")
@@ -20,23 +20,14 @@
 from gi.repository import Gtk
 from gi.repository import GObject
 
-import emoji
-
 from .tool import Tool
+from ..emoji_table import is_emoji
 
 
 class Tree(Tool):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self.canvas.drag_gesture.connect("drag-begin", self.on_drag_begin)
-        self.canvas.drag_gesture.connect("drag-update", self.on_drag_follow)
-        self.canvas.drag_gesture.connect("drag-end", self.on_drag_end)
-
-        self.canvas.click_gesture.connect("pressed", self.on_click_pressed)
-        self.canvas.click_gesture.connect("released", self.on_click_released)
-        self.canvas.click_gesture.connect("stopped", self.on_click_stopped)
-
         builder = Gtk.Builder.new_from_resource(
             "/io/github/nokse22/asciidraw/ui/tree_sidebar.ui")
         self._sidebar = builder.get_object("tree_stack_page")
@@ -89,16 +80,10 @@ class Tree(Tool):
         self.notify('text')
 
     def on_drag_begin(self, gesture, start_x, start_y):
-        if not self._active:
-            return
-
         self.drag_start_x = start_x
         self.drag_start_y = start_y
 
-    def on_drag_follow(self, gesture, x, y):
-        if not self._active:
-            return
-
+    def on_drag_update(self, gesture, x, y):
         self.drag_x = int((x + self.drag_start_x) // self.x_mul - self.drag_start_x// self.x_mul)
         self.drag_y = int((y + self.drag_start_y) // self.y_mul - self.drag_start_y// self.y_mul)
 
@@ -106,9 +91,6 @@ class Tree(Tool):
         self.preview()
 
     def on_drag_end(self, gesture, delta_x, delta_y):
-        if not self._active:
-            return
-
         self.tree_x += self.drag_x
         self.tree_y += self.drag_y
 
@@ -116,9 +98,6 @@ class Tree(Tool):
         self.drag_y = 0
 
     def on_click_pressed(self, click, arg, x, y):
-        if not self._active:
-            return
-
         x_char = int(x / self.x_mul)
         y_char = int(y / self.y_mul)
 
@@ -128,16 +107,6 @@ class Tree(Tool):
         self.canvas.clear_preview()
         self.preview()
 
-    def on_click_stopped(self, click):
-        if not self._active:
-            return
-        pass
-
-    def on_click_released(self, click, arg, x, y):
-        if not self._active:
-            return
-        pass
-
     def preview(self, *args):
         if not self._active:
             return
@@ -216,7 +185,7 @@ class Tree(Tool):
             y += 1
 
     def on_text_inserted(self, buffer, loc, text, length):
-        if emoji.is_emoji(text):
+        if is_emoji(text):
             start_iter = loc.copy()
             start_iter.backward_char()
             buffer.delete(start_iter, loc)
@@ -19,14 +19,16 @@
 
 from gi.repository import Adw
 from gi.repository import Gtk
-from gi.repository import Gdk, Gio, GObject
+from gi.repository import Gdk, Gio, GLib, GObject
 
-from .palette import Palette
+from .palette import Palette, CharList
 from .new_palette_window import NewPaletteDialog
 
 from .tools import Freehand, Eraser, Rectangle, FilledRectangle
 from .tools import Text, Table, Picker, Tree, Fill, Select, Line
 from .canvas import Canvas
+from .files import FileLoader, FileSaver
+from .journal import Journal
 
 from gettext import gettext as _
 
@@ -46,6 +48,8 @@ class AsciiDrawWindow(Adw.ApplicationWindow):
     # Headerbar
     undo_button = Gtk.Template.Child()
     redo_button = Gtk.Template.Child()
+    history_list_box = Gtk.Template.Child()
+    history_memory_label = Gtk.Template.Child()
     save_import_button = Gtk.Template.Child()
     title_widget = Gtk.Template.Child()
 
@@ -77,6 +81,7 @@ class AsciiDrawWindow(Adw.ApplicationWindow):
     # Canvas side popover
     width_spin = Gtk.Template.Child()
     height_spin = Gtk.Template.Child()
+    anchor_combo = Gtk.Template.Child()
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -126,72 +131,35 @@ class AsciiDrawWindow(Adw.ApplicationWindow):
         self.canvas.bind_property(
             'secondary_char', self.secondary_char_button, 'label',
             GObject.BindingFlags.BIDIRECTIONAL)
+        self.settings.bind(
+            "history-memory-limit", self.canvas, "history-memory-limit",
+            Gio.SettingsBindFlags.GET)
         self.canvas.connect("undo-added", self.on_undo_added)
         self.canvas.connect("undo-removed", self.on_undo_removed)
         self.canvas.connect("redo-removed", self.on_redo_removed)
+        self.canvas.connect("history-jumped", self.on_history_jumped)
         self.toast_overlay.set_child(self.canvas)
 
-        self.freehand_tool = Freehand(self.canvas)
-        self.freehand_tool.bind_property(
-            'active', self.free_button, 'active',
-            GObject.BindingFlags.BIDIRECTIONAL)
-        self.freehand_tool.add_sidebar_to(self.sidebar_stack)
-
-        self.eraser_tool = Eraser(self.canvas)
-        self.eraser_tool.bind_property(
-            'active', self.eraser_button, 'active',
-            GObject.BindingFlags.BIDIRECTIONAL)
-        self.eraser_tool.add_sidebar_to(self.sidebar_stack)
-
-        self.rectangle_tool = Rectangle(self.canvas)
-        self.rectangle_tool.bind_property(
-            'active', self.rectangle_button, 'active',
-            GObject.BindingFlags.BIDIRECTIONAL)
-
-        self.filled_rectangle_tool = FilledRectangle(self.canvas)
-        self.filled_rectangle_tool.bind_property(
-            'active', self.filled_rectangle_button, 'active',
-            GObject.BindingFlags.BIDIRECTIONAL)
-
-        self.line_tool = Line(self.canvas)
-        self.line_tool.bind_property(
-            'active', self.line_button, 'active',
-            GObject.BindingFlags.BIDIRECTIONAL)
-        self.line_tool.add_sidebar_to(self.sidebar_stack)
-
-        self.move_tool = Select(self.canvas)
-        self.move_tool.bind_property(
-            'active', self.move_button, 'active',
-            GObject.BindingFlags.BIDIRECTIONAL)
-        self.move_tool.add_sidebar_to(self.sidebar_stack)
-
-        self.text_tool = Text(self.canvas)
-        self.text_tool.bind_property(
-            'active', self.text_button, 'active',
-            GObject.BindingFlags.BIDIRECTIONAL)
-        self.text_tool.add_sidebar_to(self.sidebar_stack)
-
-        self.table_tool = Table(self.canvas)
-        self.table_tool.bind_property(
-            'active', self.table_button, 'active',
-            GObject.BindingFlags.BIDIRECTIONAL)
-        self.table_tool.add_sidebar_to(self.sidebar_stack)
-
-        self.picker_tool = Picker(self.canvas)
-        self.picker_tool.bind_property(
-            'active', self.picker_button, 'active',
-            GObject.BindingFlags.BIDIRECTIONAL)
-
-        self.tree_tool = Tree(self.canvas)
-        self.tree_tool.bind_property(
-            'active', self.tree_button, 'active',
-            GObject.BindingFlags.BIDIRECTIONAL)
-        self.tree_tool.add_sidebar_to(self.sidebar_stack)
-
-        self.fill_tool = Fill(self.canvas)
-        self.fill_tool.bind_property(
-            'active', self.fill_button, 'active',
-            GObject.BindingFlags.BIDIRECTIONAL)
+        # Tools are only built, with their sidebar page, the first time
+        # they are chosen
+        self.tools = {}
+        self.tool_factories = {
+            'freehand': (Freehand, self.free_button, True),
+            'eraser': (Eraser, self.eraser_button, True),
+            'rectangle': (Rectangle, self.rectangle_button, False),
+            'filled_rectangle': (
+                FilledRectangle, self.filled_rectangle_button, False),
+            'line': (Line, self.line_button, True),
+            'move': (Select, self.move_button, True),
+            'text': (Text, self.text_button, True),
+            'table': (Table, self.table_button, True),
+            'picker': (Picker, self.picker_button, False),
+            'tree': (Tree, self.tree_button, True),
+            'fill': (Fill, self.fill_button, False),
+        }
+        for name, (tool_class, button, has_sidebar) in \
+                self.tool_factories.items():
+            button.connect("toggled", self.on_tool_button_toggled, name)
 
         prev_btn = None
 
@@ -217,6 +185,10 @@ class AsciiDrawWindow(Adw.ApplicationWindow):
 
         self.lines_styles_box.get_first_child().set_active(True)
 
+        self.char_factory = Gtk.SignalListItemFactory()
+        self.char_factory.connect("setup", self.on_char_setup)
+        self.char_factory.connect("bind", self.on_char_bind)
+
         default_palettes_ranges = [
             {"name": "ASCII", "ranges":
                 [(0x0020, 0x007F)]},
@@ -253,6 +225,12 @@ class AsciiDrawWindow(Adw.ApplicationWindow):
         self.drawing_area_width = 0
 
         self.file_path = ""
+        self.file_loader = None
+
+        self.file_saver = FileSaver()
+        self.saved_edits = 0
+        self.file_saver.connect("saved", self.on_file_saved)
+        self.file_saver.connect("failed", self.on_file_save_failed)
 
         self.sidebar_stack.set_visible_child_name("character_page")
 
@@ -275,6 +253,22 @@ class AsciiDrawWindow(Adw.ApplicationWindow):
         directory_path = f"{self.data_dir}/palettes"
         os.makedirs(directory_path, exist_ok=True)
 
+        self.journal = Journal(os.path.join(self.data_dir, "journal"))
+        recovered = self.journal.replay()
+        if recovered is not None:
+            grid, self.file_path = recovered
+            self.canvas.load_grid(grid)
+            self.canvas.is_saved = False
+            if self.file_path != "":
+                self.title_widget.set_subtitle(
+                    os.path.basename(self.file_path))
+            toast = Adw.Toast(
+                title=_("Unsaved drawing recovered"), timeout=2)
+            self.toast_overlay.add_toast(toast)
+        self.journal.start(
+            self.canvas.history, self.file_path, recovered is None)
+        self.canvas.history.journal = self.journal
+
         for filename in os.listdir(directory_path):
             filepath = os.path.join(directory_path, filename)
             if os.path.isfile(filepath):
@@ -311,26 +305,35 @@ class AsciiDrawWindow(Adw.ApplicationWindow):
         self.add_palette_to_ui(palette)
 
     def add_palette_to_ui(self, palette):
-        flow_box = Gtk.FlowBox(
-            homogeneous=True, selection_mode=0, margin_top=3, margin_bottom=3,
-            margin_start=3, margin_end=3, valign=Gtk.Align.START)
-        for char in palette.chars:
-            new_button = Gtk.Button(label=char, css_classes=["flat", "ascii"])
-            new_button.connect("clicked", self.change_char, flow_box)
-            new_button.set_has_tooltip(True)
-            new_button.connect(
-                "query-tooltip", self.on_show_char_tooltip, char)
-            flow_box.append(new_button)
+        # Only the cells in view get a widget, they are reused on scroll
+        grid_view = Gtk.GridView(
+            model=Gtk.NoSelection(model=CharList(palette.chars)),
+            factory=self.char_factory, single_click_activate=True,
+            margin_top=3, margin_bottom=3, margin_start=3, margin_end=3)
+        grid_view.connect("activate", self.on_palette_char_activated)
         scrolled_window = Gtk.ScrolledWindow(
             name=palette.name, hexpand=True, vexpand=True)
-        scrolled_window.set_child(flow_box)
+        scrolled_window.set_child(grid_view)
         self.chars_carousel.append(scrolled_window)
 
         pos = self.chars_carousel.get_position()
         if pos != self.chars_carousel.get_n_pages() - 1:
             self.char_carousel_go_next.set_sensitive(True)
 
-    def on_show_char_tooltip(self, btn, x, y, keyboard, tooltip, _char):
+    def on_char_setup(self, factory, list_item):
+        label = Gtk.Label(css_classes=["ascii"], has_tooltip=True)
+        label.connect("query-tooltip", self.on_show_char_tooltip)
+        list_item.set_child(label)
+
+    def on_char_bind(self, factory, list_item):
+        list_item.get_child().set_label(list_item.get_item().get_string())
+
+    def on_palette_char_activated(self, grid_view, position):
+        self.change_char(grid_view.get_model().get_item(position).get_string())
+
+    def on_show_char_tooltip(self, label, x, y, keyboard, tooltip):
+        _char = label.get_label()
+
         builder = Gtk.Builder.new_from_resource(
             "/io/github/nokse22/asciidraw/ui/unicode_tooltip.ui")
 
@@ -382,9 +385,7 @@ class AsciiDrawWindow(Adw.ApplicationWindow):
 
     def save(self, callback=None):
         if self.file_path != "":
-            self.save_file(self.file_path)
-            if callback:
-                callback()
+            self.save_file(self.file_path, callback)
             return
         self.open_save_file_chooser(callback)
 
@@ -400,20 +401,79 @@ class AsciiDrawWindow(Adw.ApplicationWindow):
         self.canvas.clear_preview()
 
     def on_open_file_response(self, dialog, response):
-        file = dialog.open_finish(response)
+        try:
+            file = dialog.open_finish(response)
+        except GLib.Error:
+            return
+
         print(f"Selected File: {file.get_path()}")
 
         if file:
-            path = file.get_path()
-            try:
-                with open(path, 'r') as file:
-                    input_string = file.read()
-                self.canvas.set_content(input_string)
-                self.file_path = path
-                file_name = os.path.basename(self.file_path)
-                self.title_widget.set_subtitle(file_name)
-            except IOError:
-                print(f"Error reading {path}.")
+            self.load_file(file)
+
+    def load_file(self, file):
+        if self.file_loader is not None:
+            self.file_loader.cancel()
+            self.load_toast.dismiss()
+
+        self.file_loader = FileLoader(file)
+        self.file_loader.connect("progress", self.on_file_load_progress)
+        self.file_loader.connect("loaded", self.on_file_loaded)
+        self.file_loader.connect("failed", self.on_file_load_failed)
+        self.file_loader.connect("cancelled", self.on_file_load_cancelled)
+
+        self.load_toast = Adw.Toast(
+            title=_("Opening {}").format(file.get_basename()),
+            timeout=0, button_label=_("Cancel"))
+        self.load_toast.connect(
+            "button-clicked", self.on_load_toast_cancel_clicked)
+        self.toast_overlay.add_toast(self.load_toast)
+
+        self.file_loader.load()
+
+    def on_load_toast_cancel_clicked(self, toast):
+        if self.file_loader is not None:
+            self.file_loader.cancel()
+
+    def on_file_load_progress(self, loader, fraction):
+        if loader is not self.file_loader:
+            return
+        self.load_toast.set_title(
+            _("Opening {} ({}%)").format(
+                loader.file.get_basename(), int(fraction * 100)))
+
+    def on_file_loaded(self, loader, grid):
+        if loader is not self.file_loader:
+            return
+        self.file_loader = None
+        self.load_toast.dismiss()
+
+        self.canvas.clear_preview()
+        self.canvas.load_grid(grid)
+        self.canvas.is_saved = True
+        self.update_history_buttons()
+        self.update_canvas_size_spins()
+
+        self.file_path = loader.file.get_path()
+        self.journal.start(self.canvas.history, self.file_path, True)
+        file_name = os.path.basename(self.file_path)
+        self.title_widget.set_subtitle(file_name)
+
+    def on_file_load_failed(self, loader, message):
+        if loader is not self.file_loader:
+            return
+        self.file_loader = None
+        self.load_toast.dismiss()
+
+        print(f"Error reading {loader.file.get_path()}: {message}")
+        toast = Adw.Toast(title=_("Could not open the file"), timeout=2)
+        self.toast_overlay.add_toast(toast)
+
+    def on_file_load_cancelled(self, loader):
+        if loader is not self.file_loader:
+            return
+        self.file_loader = None
+        self.load_toast.dismiss()
 
     def new_canvas(self):
         if not self.canvas.is_saved:
@@ -458,8 +518,8 @@ class AsciiDrawWindow(Adw.ApplicationWindow):
         self.canvas.change_canvas_size(40, 20)
         self.file_path = ""
         self.title_widget.set_subtitle("")
-        self.canvas.undo_changes = []
-        self.canvas.redo_changes = []
+        self.canvas.history.clear()
+        self.journal.start(self.canvas.history, "", True)
         self.undo_button.set_sensitive(False)
         self.undo_button.set_tooltip_text("")
         self.redo_button.set_sensitive(False)
@@ -488,32 +548,44 @@ class AsciiDrawWindow(Adw.ApplicationWindow):
 
         if file:
             file_path = file.get_path()
-            self.save_file(file_path)
-
-            if callback:
-                callback()
+            self.save_file(file_path, callback)
 
-    def save_file(self, file_path):
+    def save_file(self, file_path, callback=None):
         self.file_path = file_path
         file_name = os.path.basename(file_path)
         self.title_widget.set_subtitle(file_name)
-        try:
-            with open(file_path, 'w') as file:
-                file.write(self.canvas.get_content())
-            print(f"Content written to {file_path} successfully.")
-            toast = Adw.Toast(title=_("Saved successfully"), timeout=2)
-            self.toast_overlay.add_toast(toast)
+        self.file_saver.save(
+            Gio.File.new_for_path(file_path), self.get_save_contents,
+            callback)
+
+    def get_save_contents(self):
+        # Changes made after this point are not part of the save
+        self.canvas.history.seal()
+        self.saved_edits = self.canvas.history.edits
+        return self.canvas.get_content()
+
+    def on_file_saved(self, saver, file):
+        print(f"Content written to {file.get_path()} successfully.")
+        # The drawing is only marked saved once the file is written, and
+        # only if nothing changed while it was
+        if self.canvas.history.edits == self.saved_edits:
             self.canvas.is_saved = True
-        except IOError:
-            print(f"Error writing to {file_path}.")
+            self.journal.set_saved(file.get_path())
+        toast = Adw.Toast(title=_("Saved successfully"), timeout=2)
+        self.toast_overlay.add_toast(toast)
+
+    def on_file_save_failed(self, saver, file, message):
+        print(f"Error writing to {file.get_path()}: {message}")
+        toast = Adw.Toast(title=_("Could not save the file"), timeout=2)
+        self.toast_overlay.add_toast(toast)
 
-    def change_char(self, btn, flow_box):
+    def change_char(self, char):
         if self.primary_char_button.get_active():
-            self.primary_char_button.set_label(btn.get_label())
-            self.canvas.primary_char = btn.get_label()
+            self.primary_char_button.set_label(char)
+            self.canvas.primary_char = char
         else:
-            self.secondary_char_button.set_label(btn.get_label())
-            self.canvas.secondary_char = btn.get_label()
+            self.secondary_char_button.set_label(char)
+            self.canvas.secondary_char = char
 
     def copy_to_clipboard(self):
         text = self.canvas.get_content()
@@ -526,7 +598,11 @@ class AsciiDrawWindow(Adw.ApplicationWindow):
         x = int(self.width_spin.get_value())
         y = int(self.height_spin.get_value())
 
-        self.canvas.change_canvas_size(x, y)
+        # The anchors are listed row by row, from the top left
+        index = self.anchor_combo.get_selected()
+        anchor = ((index % 3) / 2, (index // 3) / 2)
+
+        self.canvas.resize_canvas(x, y, anchor)
 
     def on_style_changed(self, btn, box):
         child = box.get_first_child()
@@ -539,8 +615,9 @@ class AsciiDrawWindow(Adw.ApplicationWindow):
             child = child.get_next_sibling()
             index += 1
 
-        self.tree_tool.preview()
-        self.table_tool.preview()
+        for name in ('tree', 'table'):
+            if name in self.tools:
+                self.tools[name].preview()
 
     @Gtk.Template.Callback("on_increase_size_activated")
     def update_canvas_size_spins(self, *args):
@@ -587,7 +664,7 @@ class AsciiDrawWindow(Adw.ApplicationWindow):
         if curr_sidebar != "character_page" and curr_sidebar != "style_page":
             self.sidebar_stack.set_visible_child_name("text_page")
         self.canvas.clear_preview()
-        self.text_tool.preview_text()
+        self.tools['text'].preview_text()
 
     @Gtk.Template.Callback("on_choose_table")
     def on_choose_table(self, btn):
@@ -595,7 +672,7 @@ class AsciiDrawWindow(Adw.ApplicationWindow):
         curr_sidebar = self.sidebar_stack.get_visible_child_name()
         if curr_sidebar != "character_page" and curr_sidebar != "style_page":
             self.sidebar_stack.set_visible_child_name("table_page")
-        self.table_tool.preview()
+        self.tools['table'].preview()
 
     @Gtk.Template.Callback("on_choose_tree_list")
     def on_choose_tree_list(self, btn):
@@ -603,7 +680,7 @@ class AsciiDrawWindow(Adw.ApplicationWindow):
         curr_sidebar = self.sidebar_stack.get_visible_child_name()
         if curr_sidebar != "character_page" and curr_sidebar != "style_page":
             self.sidebar_stack.set_visible_child_name("tree_page")
-        self.tree_tool.preview()
+        self.tools['tree'].preview()
 
     @Gtk.Template.Callback("on_choose_select")
     def on_choose_select(self, btn):
@@ -638,8 +715,9 @@ class AsciiDrawWindow(Adw.ApplicationWindow):
         self.canvas.clear_preview()
 
     def on_delete_clicked(self):
-        if self.move_tool.active:
-            self.move_tool.delete_selection()
+        move_tool = self.tools.get('move')
+        if move_tool is not None and move_tool.active:
+            move_tool.delete_selection()
 
     def new_palette_from_canvas(self):
         content = self.canvas.get_content()
@@ -655,28 +733,71 @@ class AsciiDrawWindow(Adw.ApplicationWindow):
         self.show_new_palette_window(unique_string)
 
     def on_undo_added(self, widget, undo_name):
-        self.undo_button.set_sensitive(True)
-        self.undo_button.set_tooltip_text(_("Undo") + " " + undo_name)
+        self.update_history_buttons()
 
     def on_undo_removed(self, widget):
-        if len(self.canvas.undo_changes) == 0:
+        self.update_history_buttons()
+        self.update_canvas_size_spins()
+
+    def on_redo_removed(self, widget):
+        self.update_history_buttons()
+        self.update_canvas_size_spins()
+
+    def on_history_jumped(self, widget):
+        self.update_history_buttons()
+        self.update_canvas_size_spins()
+        self.update_history_popover()
+
+    def update_history_buttons(self):
+        undo_name = self.canvas.history.get_undo_name()
+        if undo_name is None:
             self.undo_button.set_sensitive(False)
             self.undo_button.set_tooltip_text("")
         else:
-            self.undo_button.set_tooltip_text(
-                _("Undo ") + self.canvas.undo_changes[-1].name)
+            self.undo_button.set_sensitive(True)
+            self.undo_button.set_tooltip_text(_("Undo ") + undo_name)
 
-        self.redo_button.set_sensitive(True)
-        self.redo_button.set_tooltip_text(
-            _("Redo ") + self.canvas.redo_changes[-1].name)
-
-    def on_redo_removed(self, widget):
-        if len(self.canvas.redo_changes) == 0:
+        redo_name = self.canvas.history.get_redo_name()
+        if redo_name is None:
             self.redo_button.set_sensitive(False)
             self.redo_button.set_tooltip_text("")
         else:
-            self.redo_button.set_tooltip_text(
-                _("Redo ") + self.canvas.redo_changes[-1].name)
+            self.redo_button.set_sensitive(True)
+            self.redo_button.set_tooltip_text(_("Redo ") + redo_name)
+
+    @Gtk.Template.Callback("on_history_popover_show")
+    def on_history_popover_show(self, *args):
+        history = self.canvas.history
+
+        self.history_list_box.remove_all()
+        for index in range(history.start, history.get_end() + 1):
+            if index == history.start:
+                name = _("Start")
+            else:
+                name = history.get_change(index - 1).name
+            label = Gtk.Label(
+                label=name, xalign=0, margin_start=6, margin_end=6,
+                margin_top=6, margin_bottom=6)
+            self.history_list_box.append(label)
+
+        self.update_history_popover()
+
+    def update_history_popover(self):
+        history = self.canvas.history
+
+        row = self.history_list_box.get_row_at_index(
+            history.position - history.start)
+        self.history_list_box.select_row(row)
+
+        usage = history.get_memory_usage()
+        self.history_memory_label.set_label(
+            _("History uses {} of {}").format(
+                GLib.format_size(usage),
+                GLib.format_size(history.memory_limit)))
+
+    @Gtk.Template.Callback("on_history_row_activated")
+    def on_history_row_activated(self, list_box, row):
+        self.canvas.jump_to(self.canvas.history.start + row.get_index())
 
     @Gtk.Template.Callback("undo_first_change")
     def undo_first_change(self, *args):
@@ -690,6 +811,25 @@ class AsciiDrawWindow(Adw.ApplicationWindow):
     def close_sidebar(self, *args):
         self.overlay_split_view.set_show_sidebar(False)
 
+    def get_tool(self, name):
+        tool = self.tools.get(name)
+        if tool is None:
+            tool_class, button, has_sidebar = self.tool_factories[name]
+            tool = tool_class(self.canvas)
+            tool.bind_property(
+                'active', button, 'active',
+                GObject.BindingFlags.BIDIRECTIONAL)
+            if has_sidebar:
+                tool.add_sidebar_to(self.sidebar_stack)
+            self.tools[name] = tool
+        return tool
+
+    def on_tool_button_toggled(self, button, name):
+        # The button is toggled before its clicked handlers run, so the
+        # tool is there for them
+        if button.get_active() and name not in self.tools:
+            self.get_tool(name).active = True
+
     def select_rectangle_tool(self):
         self.rectangle_button.set_active(True)
 